@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.assets
+    ~~~~~~~~~~~~~~~
+
+    Content-hashed fingerprints for the files in the static folder.
+
+    If ``fingerprint_static`` is enabled in the root ``config.yml``, files
+    in the static folder as well as generated static files (such as the
+    pygments stylesheet) are written as ``name.<hash>.ext``.  The mapping
+    is available through :meth:`Builder.get_static_url` (and the
+    ``get_static_url`` template global), is written to
+    ``<static_folder>/_assets.json`` and references to the plain URLs in
+    written HTML, CSS and feed files are rewritten, with or without the
+    path prefix or the whole ``canonical_url`` in front of them.  Relative
+    references in stylesheets (``url(bg.gif)``) are resolved against the
+    folder of the stylesheet.  Since the URL of a file changes with its
+    contents it can be served with an immutable cache header.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import re
+import json
+import posixpath
+from hashlib import sha1
+from urllib.parse import urlparse
+
+
+MANIFEST_FILENAME = "_assets.json"
+rewritable_extensions = (".html", ".css", ".atom", ".xml")
+_css_reference_re = re.compile(
+    r"""(url\(\s*["']?|@import\s+["'])([^"'()\s]+)""", re.I
+)
+
+
+def fingerprint(filename, contents):
+    """Returns the fingerprinted variant of `filename` for `contents`."""
+    if isinstance(contents, str):
+        contents = contents.encode("utf-8")
+    base, ext = posixpath.splitext(filename)
+    return "%s.%s%s" % (base, sha1(contents).hexdigest()[:12], ext)
+
+
+class AssetManifest(object):
+    """Maps the names of static files to their fingerprinted names."""
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.mapping = {}
+        self.previous = {}
+        self._rewrite_re = None
+        self._hash_cache = {}
+
+    @property
+    def source_folder(self):
+        return os.path.join(
+            self.builder.project_folder, self.builder.static_folder
+        )
+
+    @property
+    def manifest_filename(self):
+        return self.builder.get_full_static_filename(MANIFEST_FILENAME)
+
+    def load_previous(self):
+        try:
+            with io.open(self.manifest_filename, encoding="utf-8") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def iter_sources(self):
+        config = self.builder.config
+        folder = self.source_folder
+        cutoff = len(folder) + 1
+        for dirpath, dirnames, filenames in os.walk(folder):
+            dirnames[:] = self.builder.filter_files(dirnames, config)
+            for filename in self.builder.filter_files(filenames, config):
+                full_filename = os.path.join(dirpath, filename)
+                name = full_filename[cutoff:].replace(os.sep, "/")
+                yield name, full_filename
+
+    def get_source_hash(self, full_filename):
+        """Returns the content hash of a source file.  Hashes are
+        remembered as long as the file's size and modification time don't
+        change.
+        """
+        st = os.stat(full_filename)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._hash_cache.get(full_filename)
+        if cached is None or cached[0] != key:
+            digest = sha1()
+            with open(full_filename, "rb") as f:
+                for block in iter(lambda: f.read(65536), b""):
+                    digest.update(block)
+            cached = (key, digest.hexdigest()[:12])
+            self._hash_cache[full_filename] = cached
+        return cached[1]
+
+    def scan(self):
+        """Fingerprints the files in the static source folder.  Stylesheets
+        are fingerprinted last and after rewriting their references, so a
+        changed image also changes the name of the stylesheet using it.
+        """
+        self.previous = self.load_previous()
+        self.mapping = {}
+        self._rewrite_re = None
+        stylesheets = []
+        for name, full_filename in self.iter_sources():
+            if name.endswith(".css"):
+                stylesheets.append((name, full_filename))
+                continue
+            base, ext = posixpath.splitext(name)
+            self.mapping[name] = "%s.%s%s" % (
+                base,
+                self.get_source_hash(full_filename),
+                ext,
+            )
+        for name, full_filename in stylesheets:
+            with io.open(full_filename, encoding="utf-8") as f:
+                contents = self.rewrite(f.read())
+            folder = posixpath.join(
+                self.builder.static_folder, posixpath.dirname(name)
+            )
+            contents = self.rewrite_relative(folder, contents)
+            self.mapping[name] = fingerprint(name, contents)
+        self._rewrite_re = None
+
+    @property
+    def changed(self):
+        """`True` if any fingerprint differs from the last build."""
+        return self.mapping != self.previous
+
+    def get_destination(self, source_filename):
+        """Returns the destination filename (relative to the output
+        folder) for a source file.
+        """
+        static_prefix = self.builder.static_folder.rstrip("/") + "/"
+        name = source_filename.replace(os.sep, "/")
+        if name.startswith(static_prefix):
+            rv = self.mapping.get(name[len(static_prefix):])
+            if rv is not None:
+                return posixpath.join(self.builder.static_folder, rv)
+        return source_filename
+
+    def get_name(self, filename):
+        return self.mapping.get(filename, filename)
+
+    def write_generated(self, filename, contents):
+        """Writes a generated static file under its fingerprinted name."""
+        name = fingerprint(filename, contents)
+        if self.mapping.get(filename) != name:
+            self.mapping[filename] = name
+            self._rewrite_re = None
+        # the name changes with the contents
+        self.builder.write_output(
+            self.builder.get_full_static_filename(name),
+            contents,
+            only_if_changed=True,
+        )
+
+    def save(self):
+        with self.builder.open_output_file(
+            self.manifest_filename, only_if_changed=True
+        ) as f:
+            f.write(json.dumps(self.mapping, indent=2, sort_keys=True))
+        self.previous = dict(self.mapping)
+
+    def rewrite(self, contents):
+        """Replaces static URLs in `contents` with fingerprinted ones."""
+        if not self.mapping:
+            return contents
+        if self._rewrite_re is None:
+            names = sorted(self.mapping, key=len, reverse=True)
+            self._rewrite_re = re.compile(
+                r"(?<=[\"'(=])(%s)(%s)(?=[\"')?#\s>])"
+                % (
+                    "|".join(map(re.escape, self.get_url_prefixes())),
+                    "|".join(map(re.escape, names)),
+                )
+            )
+        return self._rewrite_re.sub(
+            lambda m: m.group(1) + self.mapping[m.group(2)], contents
+        )
+
+    def get_url_prefixes(self):
+        """Returns the prefixes of absolute static URLs, longest first:
+        the static folder on its own, below the path prefix and below the
+        canonical URL.
+        """
+        static = "/" + self.builder.static_folder.strip("/") + "/"
+        prefix = self.builder.prefix_path.rstrip("/")
+        parsed = urlparse(self.builder.config.root_get("canonical_url"))
+        origin = ""
+        if parsed.scheme and parsed.netloc:
+            origin = "%s://%s" % (parsed.scheme, parsed.netloc)
+        rv = set([static, prefix + static])
+        if origin:
+            rv.update([origin + static, origin + prefix + static])
+        return sorted(rv, key=len, reverse=True)
+
+    def rewrite_relative(self, folder, contents):
+        """Replaces relative references in a stylesheet in `folder` (a
+        path relative to the output folder) with fingerprinted ones.
+        """
+        if not self.mapping:
+            return contents
+        static = self.builder.static_folder.strip("/") + "/"
+
+        def replace(match):
+            url = match.group(2)
+            path = re.split(r"[?#]", url, 1)[0]
+            if not path or path.startswith("/") or ":" in path:
+                return match.group(0)
+            resolved = posixpath.normpath(posixpath.join(folder, path))
+            if not resolved.startswith(static):
+                return match.group(0)
+            name = self.mapping.get(resolved[len(static):])
+            if name is None:
+                return match.group(0)
+            return "%s%s%s" % (
+                match.group(1),
+                posixpath.join(
+                    posixpath.dirname(path), posixpath.basename(name)
+                ),
+                url[len(path):],
+            )
+
+        return _css_reference_re.sub(replace, contents)
+
+    def rewrite_output(self, filename, contents):
+        """Output filter rewriting static URLs in written files."""
+        if filename.endswith(".css"):
+            folder = os.path.relpath(
+                os.path.dirname(filename), self.builder.default_output_folder
+            )
+            contents = self.rewrite_relative(
+                folder.replace(os.sep, "/"), contents
+            )
+        if filename.endswith(rewritable_extensions):
+            return self.rewrite(contents)
+        return contents
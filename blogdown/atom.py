@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.atom
+    ~~~~~~~~~~~~~
+
+    Atom feeds for the blog and tags modules.  Feeds are streamed into
+    the output file entry by entry.  The output only depends on the
+    entries (the feed is as recent as its newest entry), so a feed whose
+    entries didn't change is not written again.  The escaped contents of
+    an entry are rendered once per build and shared by all feeds.
+
+    The feedgen package can be used instead by setting the backend in
+    ``config.yml``::
+
+        feed:
+          backend: feedgen
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+from datetime import datetime
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape, quoteattr
+
+from pytz import UTC
+
+
+epoch = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def to_utc(dt):
+    if dt is None:
+        return epoch
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
+
+
+def format_date(dt):
+    return to_utc(dt).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def get_escaped_contents(builder, entry):
+    return builder.memoize(
+        ("atom.contents", entry.source_filename),
+        lambda: escape(str(entry.render_contents())),
+    )
+
+
+def write_atom(builder, f, info, entries):
+    """Streams the feed described by `info` to `f`."""
+    updated = max([to_utc(entry.pub_date) for entry in entries] or [epoch])
+    f.write('<?xml version="1.0" encoding="utf-8"?>\n')
+    f.write('<feed xmlns="http://www.w3.org/2005/Atom">\n')
+    f.write("  <id>%s</id>\n" % escape(info["id"]))
+    f.write("  <title>%s</title>\n" % escape(info["title"]))
+    f.write("  <subtitle>%s</subtitle>\n" % escape(info["subtitle"]))
+    f.write("  <updated>%s</updated>\n" % format_date(updated))
+    f.write("  <link href=%s/>\n" % quoteattr(info["url"]))
+    f.write('  <link href=%s rel="self"/>\n' % quoteattr(info["id"]))
+    f.write("  <generator>blogdown</generator>\n")
+    for entry in entries:
+        entry_url = urljoin(info["url"], entry.slug)
+        f.write("  <entry>\n")
+        f.write("    <id>%s</id>\n" % escape(entry_url))
+        f.write("    <title>%s</title>\n" % escape(str(entry.title or "")))
+        f.write("    <updated>%s</updated>\n" % format_date(entry.pub_date))
+        if info["author"]:
+            f.write(
+                "    <author><name>%s</name></author>\n"
+                % escape(info["author"])
+            )
+        f.write('    <link href=%s rel="alternate"/>\n' % quoteattr(entry_url))
+        f.write('    <content type="html">')
+        f.write(get_escaped_contents(builder, entry))
+        f.write("</content>\n")
+        f.write("  </entry>\n")
+    f.write("</feed>\n")
+
+
+def write_feedgen(builder, f, info, entries):
+    """Writes the feed with feedgen."""
+    from feedgen.feed import FeedGenerator
+
+    feed = FeedGenerator()
+    feed.id(info["id"])
+    feed.link(href=info["url"])
+    feed.link(href=info["id"], rel="self")
+    feed.title(info["title"])
+    feed.subtitle(info["subtitle"])
+    for entry in entries:
+        fe = feed.add_entry()
+        fe.id(urljoin(info["url"], entry.slug))
+        fe.link(href=fe.id(), rel="self")
+        fe.title(entry.title)
+        fe.content(entry.render_contents(), type="html")
+        fe.author(name=info["author"])
+        fe.updated(entry.pub_date)
+    f.write(feed.atom_str().decode("utf-8") + "\n")
+
+
+backends = {"atom": write_atom, "feedgen": write_feedgen}
+
+
+def write_feed(builder, entries, _key, **values):
+    """Writes the feed of `entries` to the file of the URL rule `_key`."""
+    url = builder.config.root_get("canonical_url") or "http://localhost/"
+    info = {
+        "id": urljoin(url, builder.link_to(_key, **values)),
+        "url": url,
+        "title": builder.config.get("feed.name") or "Recent Blog Posts",
+        "subtitle": builder.config.get("feed.subtitle")
+        or "Recent blog posts",
+        "author": builder.config.root_get("author"),
+    }
+    backend = backends[builder.config.root_get("feed.backend") or "atom"]
+    filename = builder.get_link_filename(_key, **values)
+    with builder.open_output_file(filename, only_if_changed=True) as f:
+        backend(builder, f, info, entries)
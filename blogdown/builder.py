@@ -11,11 +11,15 @@
 import io
 import re
 import os
+import json
 import posixpath
+from datetime import datetime
 from fnmatch import fnmatch
+from functools import partial
 from urllib.parse import urlparse
 
 from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup
 
 from babel import Locale, dates
 
@@ -23,34 +27,124 @@ from werkzeug.routing import Map, Rule
 from werkzeug.urls import url_unquote
 
 from blogdown.signals import (
+    before_build_started,
     before_file_processed,
     before_template_rendered,
     before_build_finished,
     before_file_built,
     after_file_prepared,
     after_file_published,
+    after_files_built,
+    entries_published,
 )
-from blogdown.programs import MDProgram, RSTProgram, CopyProgram
+from blogdown.programs import (
+    MDProgram,
+    CommonMarkProgram,
+    RSTProgram,
+    CopyProgram,
+)
+from blogdown.assets import AssetManifest
+from blogdown.cache import Cache, CACHE_FOLDER
+from blogdown.config import Config
+from blogdown.pagecache import PageCache
+from blogdown.depends import DependencyIndex, record_template
+from blogdown.fragments import FragmentCacheExtension
+from blogdown.compress import encodings, precompress
+from blogdown.minify import Minifier
+from blogdown.shards import (
+    get_shard,
+    save_partial,
+    load_partials,
+    remove_partials,
+)
+from blogdown.snapshot import (
+    Status,
+    add_folder,
+    new_snapshot,
+    take_snapshot,
+    stat_file,
+    stat_dependencies,
+    load_snapshot,
+    save_snapshot,
+)
+from blogdown.urls import URLBuilder
+from blogdown.writer import OutputFile, WriterPool, write_file
 from blogdown import plugin
 
 
 OUTPUT_FOLDER = "_build"
-builtin_programs = {"md": MDProgram, "rst": RSTProgram, "copy": CopyProgram}
+builtin_programs = {
+    "md": MDProgram,
+    "commonmark": CommonMarkProgram,
+    "rst": RSTProgram,
+    "copy": CopyProgram,
+}
 builtin_templates = os.path.join(os.path.dirname(__file__), "templates")
 url_parts_re = re.compile(r"\$(\w+|{[^}]+})")
+named_date_formats = ("full", "long", "medium", "short")
+
+
+def get_slug(source_filename):
+    directory, filename = os.path.split(source_filename)
+    basename, ext = os.path.splitext(filename)
+    if basename == "index":
+        return (
+            posixpath.join(directory, basename).rstrip("/").replace("\\", "/")
+        )
+    return posixpath.join(directory, basename).replace("\\", "/")
 
 
 class Context(object):
     """Per rendering information"""
 
-    def __init__(self, builder, config, source_filename, prepare=False):
+    # modules may still set their own attributes (such as ``tags``), and
+    # programs only keep a weak reference to their context.
+    __slots__ = (
+        "builder",
+        "config",
+        "title",
+        "summary",
+        "pub_date",
+        "source_filename",
+        "full_source_filename",
+        "links",
+        "templates",
+        "included_files",
+        "rendered_summary",
+        "program_name",
+        "program",
+        "_source_entry",
+        "_slug",
+        "_destination_filename",
+        "full_destination_filename",
+        "destination_folder",
+        "__dict__",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        builder,
+        config,
+        source_filename,
+        prepare=False,
+        source_entry=None,
+    ):
         self.builder = builder
         self.config = config
         self.title = None
         self.summary = None
         self.pub_date = None
         self.source_filename = source_filename
+        self.full_source_filename = os.path.join(
+            builder.project_folder, source_filename
+        )
+        self._source_entry = source_entry
+        self._slug = None
         self.links = []
+        self.templates = set()
+        self.included_files = set()
+        self.rendered_summary = None
         self.program_name = self.config.get("program")
         if self.program_name is None:
             self.program_name = self.builder.guess_program(
@@ -62,14 +156,48 @@ class Context(object):
             self.program.get_desired_filename(),
         )
         if prepare:
-            self.program.prepare()
-            after_file_prepared.send(self)
-            if self.public:
-                after_file_published.send(self)
+            self.prepare()
+
+    def prepare(self):
+        self.program.prepare()
+        # the program might have changed the configuration
+        self.destination_filename = self.destination_filename
+        self.publish()
+
+    def publish(self):
+        """Announces the prepared context to the modules."""
+        after_file_prepared.send(self)
+        if self.public:
+            after_file_published.send(self)
+
+    @property
+    def destination_filename(self):
+        return self._destination_filename
+
+    @destination_filename.setter
+    def destination_filename(self, value):
+        self._destination_filename = value
+        self.full_destination_filename = os.path.join(
+            self.builder.project_folder,
+            self.config.get("output_folder") or OUTPUT_FOLDER,
+            value,
+        )
+        self.destination_folder = os.path.dirname(
+            self.full_destination_filename
+        )
+
+    @property
+    def source_stat(self):
+        if self._source_entry is None:
+            return os.stat(self.full_source_filename)
+        return self._source_entry.stat()
 
     @property
     def is_new(self):
-        return not os.path.exists(self.full_destination_filename)
+        return (
+            self.builder.get_output_stat(self.full_destination_filename)
+            is None
+        )
 
     @property
     def public(self):
@@ -77,51 +205,38 @@ class Context(object):
 
     @property
     def slug(self):
-        directory, filename = os.path.split(self.source_filename)
-        basename, ext = os.path.splitext(filename)
-        if basename == "index":
-            return (
-                posixpath.join(directory, basename)
-                .rstrip("/")
-                .replace("\\", "/")
-            )
-        return posixpath.join(directory, basename).replace("\\", "/")
+        if self._slug is None:
+            self._slug = get_slug(self.source_filename)
+        return self._slug
 
     def make_destination_folder(self):
-        folder = self.destination_folder
-        if not os.path.isdir(folder):
-            os.makedirs(folder)
+        self.builder.make_output_folder(self.full_destination_filename)
 
     def open_source_file(self, mode="r"):
         return io.open(self.full_source_filename, mode, encoding="utf-8")
 
     def open_destination_file(self, mode="w"):
-        self.make_destination_folder()
-        return io.open(self.full_destination_filename, mode, encoding="utf-8")
-
-    @property
-    def destination_folder(self):
-        return os.path.dirname(self.full_destination_filename)
-
-    @property
-    def full_destination_filename(self):
-        return os.path.join(
-            self.builder.project_folder,
-            self.config.get("output_folder") or OUTPUT_FOLDER,
-            self.destination_filename,
+        return self.builder.open_output_file(
+            self.full_destination_filename, mode
         )
 
-    @property
-    def full_source_filename(self):
-        return os.path.join(self.builder.project_folder, self.source_filename)
-
     @property
     def needs_build(self):
-        if self.is_new:
+        if self.builder.force_rebuild:
+            return True
+        dst = self.builder.get_output_stat(self.full_destination_filename)
+        if dst is None or dst.st_mtime < self.source_stat.st_mtime:
             return True
-        src = self.full_source_filename
-        dst = self.full_destination_filename
-        return os.path.getmtime(dst) < os.path.getmtime(src)
+        return self.builder.dependencies.is_stale(self)
+
+    def add_dependency(self, filename):
+        """Records that the output depends on `filename`, a file that is
+        not the source itself.  Relative names are relative to the project
+        folder.  The file is built again when the dependency changed.
+        """
+        self.included_files.add(
+            os.path.join(self.builder.project_folder, filename)
+        )
 
     def get_default_template_context(self):
         return {
@@ -145,7 +260,24 @@ class Context(object):
         if not self.summary:
             return ""
 
-        return self.program.render(self.summary)
+        if self.rendered_summary is None:
+            self.rendered_summary = self.program.render(self.summary)
+        return self.rendered_summary
+
+    def get_metadata(self):
+        """Returns what a partial build needs to know about this context
+        to stand in for it without preparing it again.
+        """
+        own_layers = self.config.stack[len(self.builder.config.stack):]
+        return {
+            "title": self.title,
+            "summary": self.summary,
+            "rendered_summary": self.rendered_summary,
+            "pub_date": self.pub_date and self.pub_date.isoformat(),
+            "program": self.program_name,
+            "destination": self.destination_filename,
+            "config": own_layers,
+        }
 
     def add_stylesheet(self, href, type=None, media=None):
         if type is None:
@@ -159,14 +291,101 @@ class Context(object):
             }
         )
 
-    def run(self):
+    def run(self, force=False):
+        del self.links[:]
         before_file_processed.send(self)
-        if self.needs_build:
+        if force or self.needs_build:
             self.build()
 
     def build(self):
+        self.templates.clear()
         before_file_built.send(self)
-        self.program.run()
+        page_cache = self.builder.page_cache
+        if page_cache is None or not self.program.cacheable:
+            self.program.run()
+        else:
+            key = page_cache.get_key(self)
+            if not page_cache.restore(self, key):
+                with page_cache.record(self, key):
+                    self.program.run()
+        self.builder.dependencies.update(self)
+
+
+class StoredContext(object):
+    """Stands in for the context of a file that is not part of a partial
+    build.  It is created from the metadata stored by the last build and
+    published to the modules like a prepared context.  The real context
+    is only prepared if rendered contents are needed.
+    """
+
+    def __init__(self, builder, source_filename, metadata):
+        self.builder = builder
+        self.source_filename = source_filename
+        self.metadata = metadata
+        self.config = Config()
+        self.config.stack = builder.config.stack + metadata["config"]
+        self.title = metadata["title"]
+        self.summary = metadata["summary"]
+        self.pub_date = metadata["pub_date"]
+        if self.pub_date is not None:
+            self.pub_date = datetime.fromisoformat(self.pub_date)
+        self.rendered_summary = metadata["rendered_summary"]
+        if self.rendered_summary is not None:
+            self.rendered_summary = Markup(self.rendered_summary)
+        self.program_name = metadata["program"]
+        self.destination_filename = metadata["destination"]
+        self.full_source_filename = os.path.join(
+            builder.project_folder, source_filename
+        )
+        self.full_destination_filename = os.path.join(
+            builder.project_folder,
+            self.config.get("output_folder") or OUTPUT_FOLDER,
+            self.destination_filename,
+        )
+        self.slug = get_slug(source_filename)
+        self.links = []
+        self._context = None
+        self._program = None
+
+    public = Context.public
+    publish = Context.publish
+
+    @property
+    def program(self):
+        """The program of the file, for modules that need to know what
+        kind of file they were published.  It is never run.
+        """
+        if self._program is None:
+            program = self.builder.programs.get(self.program_name)
+            if program is not None:
+                self._program = program(self)
+        return self._program
+
+    @property
+    def context(self):
+        if self._context is None:
+            self._context = Context(
+                self.builder,
+                self.builder.get_local_config(
+                    os.path.dirname(self.source_filename)
+                ),
+                self.source_filename,
+            )
+            self._context.program.prepare()
+        return self._context
+
+    def get_metadata(self):
+        return self.metadata
+
+    def render_contents(self):
+        return self.context.render_contents()
+
+    def render_summary(self):
+        if not self.summary:
+            return ""
+        if self.rendered_summary is None:
+            self.rendered_summary = self.context.render_summary()
+        return self.rendered_summary
 
 
 class BuildError(ValueError):
@@ -192,22 +411,41 @@ class Builder(object):
         self.programs = builtin_programs.copy()
         self.modules = []
         self.storage = {}
+        self._memos = {}
+        self.markdown_engines = {}
+        self.written_files = set()
+        self.removed_files = set()
+        self.captured_files = None
+        self._output_entries = {}
+        self._output_folders = set()
+        self._config_cache = {}
+        self._context_cache = None
+        self.partial_build = False
+        self.output_filters = []
+        self.batch_hooks = []
+        self._batch_executor = None
+        self.force_rebuild = False
+        self.memory_report = None
         self.url_map = Map()
         parsed = urlparse(self.config.root_get("canonical_url"))
         self.prefix_path = parsed.path
         self.url_adapter = self.url_map.bind(
             "dummy.invalid", script_name=self.prefix_path
         )
+        self.url_builder = URLBuilder(self.url_adapter)
         self.register_url("page", "/<path:slug>")
 
-        template_path = os.path.join(
+        self.template_path = template_path = os.path.join(
             self.project_folder,
             self.config.root_get("template_path")
             or self.default_template_path,
         )
         self.locale = Locale(self.config.root_get("locale") or "en")
+        self._date_patterns = {}
+        self._formatted_dates = {}
         self.jinja_env = Environment(
             loader=FileSystemLoader([template_path, builtin_templates]),
+            extensions=[FragmentCacheExtension],
         )
         self.jinja_env.globals.update(
             link_to=self.link_to,
@@ -219,6 +457,38 @@ class Builder(object):
         self.static_folder = (
             self.config.root_get("static_folder") or self.default_static_folder
         )
+        build_cache = self.config.root_get("build_cache")
+        build_cache_size = self.config.root_get("build_cache_size")
+        self.cache = Cache(
+            os.path.join(
+                self.project_folder,
+                self.config.root_get("cache_folder") or CACHE_FOLDER,
+            ),
+            build_cache and os.path.join(self.project_folder, build_cache),
+            build_cache_size and build_cache_size * 1024 * 1024,
+        )
+        self.page_cache = PageCache(self) if self.cache.shared else None
+        self.assets = None
+        if self.config.root_get("fingerprint_static"):
+            self.assets = AssetManifest(self)
+            self.output_filters.append(self.assets.rewrite_output)
+        self.minifier = None
+        minify = self.config.root_get("minify")
+        if minify:
+            self.minifier = Minifier(self, None if minify is True else minify)
+            self.output_filters.append(self.minifier)
+        self.jinja_env.globals["get_static_url"] = self.get_static_url
+        self.writer = None
+        write_workers = self.config.root_get("write_workers")
+        if write_workers:
+            self.writer = WriterPool(
+                self.make_output_folder,
+                write_workers,
+                self.config.root_get("write_queue_size") or 64,
+                bool(self.config.root_get("write_fsync")),
+            )
+        self.dependencies = DependencyIndex(self)
+        before_template_rendered.connect(record_template)
 
         # The order is chosen on purpose to allow overriding:
         # local configuration > 3rdparty entrypoints > blogdown default
@@ -243,6 +513,8 @@ class Builder(object):
             self.modules.append(plugin_instance)
             # TODO: warn about further implementations being ignored?
 
+        self.url_builder.compile()
+
     @property
     def default_output_folder(self):
         return os.path.join(
@@ -251,27 +523,155 @@ class Builder(object):
         )
 
     def link_to(self, _key, **values):
-        return self.url_adapter.build(_key, values)
+        return self.url_builder.build(_key, values)
 
     def get_link_filename(self, _key, **values):
-        link = url_unquote(self.link_to(_key, **values).lstrip("/"))
-        if not link or link.endswith("/"):
-            link += "index.html"
-        return os.path.join(self.default_output_folder, link)
+        entry = self.url_builder.lookup(_key, values)
+        if entry[1] is None:
+            link = url_unquote(entry[0].lstrip("/"))
+            if not link or link.endswith("/"):
+                link += "index.html"
+            entry[1] = os.path.join(self.default_output_folder, link)
+        return entry[1]
 
-    def open_link_file(self, _key, mode="w", **values):
+    def open_link_file(self, _key, mode="w", only_if_changed=False, **values):
         filename = self.get_link_filename(_key, **values)
-        folder = os.path.dirname(filename)
-        if not os.path.isdir(folder):
-            os.makedirs(folder)
+        return self.open_output_file(filename, mode, only_if_changed)
+
+    def open_output_file(self, filename, mode="w", only_if_changed=False):
+        """Opens a file in the output folder for writing.  The contents are
+        passed to :meth:`write_output` once the file is closed.
+        """
+        if mode == "w":
+            return OutputFile(
+                partial(
+                    self.write_output,
+                    filename,
+                    only_if_changed=only_if_changed,
+                )
+            )
+        self.wait_for_writes()
+        self.make_output_folder(filename)
+        self.add_written_file(filename)
         return io.open(filename, mode, encoding="utf-8")
 
+    def make_output_folder(self, filename):
+        folder = os.path.dirname(filename)
+        if folder not in self._output_folders:
+            os.makedirs(folder, exist_ok=True)
+            self._output_folders.add(folder)
+
+    def write_output(self, filename, contents, only_if_changed=False):
+        """Runs the output filters over `contents`, writes the result to
+        `filename` and records the file as written in this build.  Bytes
+        are written as they are.  With a writer pool the file is written
+        in the background.  If `only_if_changed` is set, a file that
+        already has these contents is left alone.
+        """
+        if not isinstance(contents, bytes):
+            for func in self.output_filters:
+                contents = func(filename, contents)
+        if self.captured_files is not None:
+            self.captured_files[filename] = contents
+        if only_if_changed and self.output_matches(filename, contents):
+            return
+        if self.writer is not None:
+            self.writer.write(filename, contents)
+        else:
+            self.make_output_folder(filename)
+            write_file(filename, contents)
+        self.add_written_file(filename)
+
+    def output_matches(self, filename, contents):
+        """`True` if the output file has exactly these contents."""
+        if not isinstance(contents, bytes):
+            contents = contents.encode("utf-8")
+        st = self.get_output_stat(filename)
+        if st is None or st.st_size != len(contents):
+            return False
+        with open(filename, "rb") as f:
+            return f.read() == contents
+
+    def wait_for_writes(self):
+        """Blocks until the writer pool wrote all pending files and raises
+        the first error that happened while writing.
+        """
+        if self.writer is not None:
+            self.writer.wait()
+
+    def add_written_file(self, filename):
+        """Records a file as written in this build."""
+        self.written_files.add(filename)
+        if self.captured_files is not None:
+            self.captured_files.setdefault(filename, None)
+        self._output_entries.pop(os.path.dirname(filename), None)
+
+    def remove_output_file(self, filename):
+        """Removes a file that is no longer part of the output together
+        with its precompressed siblings and records them as removed in
+        this build.
+        """
+        for name in [filename] + [
+            filename + suffix for suffix, func in encodings.values()
+        ]:
+            if self.get_output_stat(name) is None:
+                continue
+            os.remove(name)
+            self.written_files.discard(name)
+            self.removed_files.add(name)
+            self._output_entries.pop(os.path.dirname(name), None)
+        # a page of its own leaves an empty folder behind
+        try:
+            os.rmdir(os.path.dirname(filename))
+        except OSError:
+            pass
+        else:
+            self._output_folders.discard(os.path.dirname(filename))
+
+    def prune_outputs(self, contexts):
+        """Removes the destination files of the last build that no
+        context of this build has, like the page of a deleted source.
+        Only files the builder wrote itself are ever removed.
+        """
+        current = set(
+            context.full_destination_filename for context in contexts
+        )
+        for source_filename, metadata in self.load_metadata().items():
+            filename = StoredContext(
+                self, source_filename, metadata
+            ).full_destination_filename
+            if filename not in current and filename not in self.written_files:
+                self.remove_output_file(filename)
+
+    def get_output_stat(self, filename):
+        """Returns the stat result of a file in the output folder or `None`
+        if it doesn't exist.  Each output folder is listed once and its
+        entries are kept until something is written to it.
+        """
+        folder, name = os.path.split(filename)
+        entries = self._output_entries.get(folder)
+        if entries is None:
+            try:
+                with os.scandir(folder) as it:
+                    entries = dict((entry.name, entry) for entry in it)
+            except OSError:
+                entries = {}
+            self._output_entries[folder] = entries
+        entry = entries.get(name)
+        if entry is None:
+            return None
+        try:
+            return entry.stat()
+        except OSError:
+            return None
+
     def register_url(
         self, key, rule=None, config_key=None, config_default=None, **extra
     ):
         if config_key is not None:
             rule = self.config.root_get(config_key, config_default)
         self.url_map.add(Rule(rule, endpoint=key, **extra))
+        self.url_builder.invalidate()
 
     def get_full_static_filename(self, filename):
         return os.path.join(
@@ -279,14 +679,59 @@ class Builder(object):
         )
 
     def get_static_url(self, filename):
+        if self.assets is not None:
+            filename = self.assets.get_name(filename)
         return "/" + posixpath.join(self.static_folder, filename)
 
-    def open_static_file(self, filename, mode="w"):
+    def open_static_file(self, filename, mode="w", only_if_changed=False):
+        if self.assets is not None and mode == "w":
+            return OutputFile(partial(self.assets.write_generated, filename))
         full_filename = self.get_full_static_filename(filename)
-        folder = os.path.dirname(full_filename)
-        if not os.path.isdir(folder):
-            os.makedirs(folder)
-        return io.open(full_filename, mode, encoding="utf-8")
+        return self.open_output_file(full_filename, mode, only_if_changed)
+
+    def register_batch_hook(self, hook):
+        """Registers a :class:`~blogdown.plugin.BatchHook`."""
+        self.batch_hooks.append(hook)
+
+    def get_batch_executor(self):
+        """Returns the process pool for parallel safe batch hooks or
+        `None` if ``batch_workers`` is not configured.
+        """
+        workers = self.config.root_get("batch_workers")
+        if not workers or workers < 2:
+            return None
+        if self._batch_executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._batch_executor = ProcessPoolExecutor(workers)
+        return self._batch_executor
+
+    def publish_entries(self, contexts):
+        """Hands all published contexts to the batch hooks."""
+        entries = [context for context in contexts if context.public]
+        entries_published.send(self, entries=entries)
+        executor = self.get_batch_executor()
+        chunks = self.config.root_get("batch_workers") or 1
+        for hook in self.batch_hooks:
+            plugin.run_batch_hook(hook, self, entries, executor, chunks)
+        self.invalidate_memos()
+        if self.page_cache is not None:
+            self.page_cache.reset(entries)
+
+    def memoize(self, key, func, *args):
+        """Returns ``func(*args)``, computed once per `key`.  Memoized
+        values are dropped when a build starts and once all entries were
+        published; a module that changes its storage later on has to call
+        :meth:`invalidate_memos`.
+        """
+        try:
+            return self._memos[key]
+        except KeyError:
+            rv = self._memos[key] = func(*args)
+            return rv
+
+    def invalidate_memos(self):
+        self._memos.clear()
 
     def get_storage(self, module):
         return self.storage.setdefault(module, {})
@@ -306,8 +751,11 @@ class Builder(object):
         return result
 
     def guess_program(self, config, filename):
-        mapping = config.list_entries("programs") or self.default_programs
+        mapping = config.list_entries("programs")
         for pattern, program_name in mapping.items():
+            if fnmatch(filename, pattern[len("programs."):]):
+                return program_name
+        for pattern, program_name in self.default_programs.items():
             if fnmatch(filename, pattern):
                 return program_name
         return "copy"
@@ -321,53 +769,480 @@ class Builder(object):
         before_template_rendered.send(tmpl, context=context)
         return tmpl.render(context)
 
+    def get_date_pattern(self, kind, format):
+        """Returns the babel pattern for a ``date``, ``time`` or
+        ``datetime`` format in the builder's locale.  Patterns are parsed
+        once and then reused for the lifetime of the builder.
+        """
+        key = (kind, format)
+        rv = self._date_patterns.get(key)
+        if rv is None:
+            if format not in named_date_formats:
+                rv = dates.parse_pattern(format)
+            elif kind == "datetime":
+                # named datetime formats combine the date and the time
+                # format of the same name, babel has to do that itself.
+                rv = format
+            else:
+                getter = getattr(dates, "get_%s_format" % kind)
+                rv = dates.parse_pattern(getter(format, locale=self.locale))
+            self._date_patterns[key] = rv
+        return rv
+
+    def _format(self, kind, value, format):
+        formatter = getattr(dates, "format_" + kind)
+        pattern = self.get_date_pattern(kind, format)
+        if value is None:
+            return formatter(value, pattern, locale=self.locale)
+        # aware datetimes in different timezones compare equal but are
+        # formatted in their own timezone
+        key = (kind, value, getattr(value, "tzinfo", None), format)
+        rv = self._formatted_dates.get(key)
+        if rv is None:
+            rv = formatter(value, pattern, locale=self.locale)
+            self._formatted_dates[key] = rv
+        return rv
+
     def format_datetime(self, datetime=None, format="medium"):
-        return dates.format_datetime(datetime, format, locale=self.locale)
+        return self._format("datetime", datetime, format)
 
     def format_time(self, time=None, format="medium"):
-        return dates.format_time(time, format, locale=self.locale)
+        return self._format("time", time, format)
 
     def format_date(self, date=None, format="medium"):
-        return dates.format_date(date, format, locale=self.locale)
+        return self._format("date", date, format)
+
+    def load_local_config(self, parent, filename, st=None):
+        """Returns `parent` with the config file `filename` added.  Parsed
+        files are remembered until they change.
+        """
+        if st is None:
+            st = os.stat(filename)
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._config_cache.get(filename)
+        if cached is not None and cached[0] == key and cached[1] is parent:
+            return cached[2]
+        with io.open(filename) as f:
+            config = parent.add_from_file(f)
+        self._config_cache[filename] = (key, parent, config)
+        return config
+
+    def get_local_config(self, folder):
+        """Returns the config for files in `folder` (relative to the
+        project folder), the same way :meth:`iter_contexts` computes it.
+        """
+        filename = os.path.join(self.project_folder, folder, "config.yml")
+        if os.path.isfile(filename):
+            return self.load_local_config(self.config, filename)
+        return self.config
+
+    def enable_context_cache(self):
+        """Keeps prepared contexts between builds.  A context is prepared
+        again only if its source file or configuration changed, otherwise
+        it is just published to the modules again.  Used by the daemon.
+        """
+        self._context_cache = {}
+
+    def get_prepared_context(self, config, source_filename, entry):
+        st = entry.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._context_cache.get(source_filename)
+        if (
+            cached is not None
+            and cached[0] is config
+            and cached[1] == key
+            and not self.dependencies.files_changed(source_filename)
+        ):
+            context = cached[2]
+            context.publish()
+            return context
+        context = Context(
+            self, config, source_filename, prepare=True, source_entry=entry
+        )
+        self._context_cache[source_filename] = (config, key, context)
+        return context
 
-    def iter_contexts(self, prepare=True):
-        last_config = self.config
+    def walk(self, snapshot=None):
+        """Walks the project folder top-down with :func:`os.scandir`.
+        Yields ``(dirpath, config, entries)`` for every folder that is not
+        ignored, where `entries` are the :class:`os.DirEntry` objects of
+        the files that are not ignored.  Their cached stat results are
+        reused by the contexts, and added to `snapshot` if one is given.
+        """
         cutoff = len(self.project_folder) + 1
-        for dirpath, dirnames, filenames in os.walk(self.project_folder):
-            local_config = last_config
-            local_config_filename = os.path.join(dirpath, "config.yml")
-            if os.path.isfile(local_config_filename):
-                with io.open(local_config_filename) as f:
-                    local_config = last_config.add_from_file(f)
-
-            dirnames[:] = self.filter_files(dirnames, local_config)
-            filenames = self.filter_files(filenames, local_config)
-
-            for filename in filenames:
-                yield Context(
-                    self,
-                    local_config,
-                    os.path.join(dirpath[cutoff:], filename),
-                    prepare,
+        stack = [self.project_folder]
+        while stack:
+            dirpath = stack.pop()
+            files = {}
+            dirs = []
+            with os.scandir(dirpath) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        # like os.walk, don't follow symlinked folders
+                        if not entry.is_symlink():
+                            dirs.append(entry.name)
+                    else:
+                        files[entry.name] = entry
+
+            local_config = self.config
+            config_entry = files.get("config.yml")
+            if config_entry is not None:
+                local_config = self.load_local_config(
+                    self.config, config_entry.path, config_entry.stat()
+                )
+
+            entries = [
+                files[name]
+                for name in self.filter_files(list(files), local_config)
+            ]
+            if snapshot is not None:
+                add_folder(snapshot, cutoff, config_entry, entries)
+            yield dirpath, local_config, entries
+            for name in reversed(self.filter_files(dirs, local_config)):
+                stack.append(os.path.join(dirpath, name))
+
+    def iter_contexts(self, prepare=True, snapshot=None):
+        cutoff = len(self.project_folder) + 1
+        use_cache = prepare and self._context_cache is not None
+        seen = set()
+        for dirpath, local_config, entries in self.walk(snapshot):
+            for entry in entries:
+                source_filename = os.path.join(dirpath[cutoff:], entry.name)
+                if use_cache:
+                    seen.add(source_filename)
+                    yield self.get_prepared_context(
+                        local_config, source_filename, entry
+                    )
+                else:
+                    yield Context(
+                        self,
+                        local_config,
+                        source_filename,
+                        prepare,
+                        source_entry=entry,
+                    )
+
+        if use_cache:
+            for source_filename in set(self._context_cache) - seen:
+                del self._context_cache[source_filename]
+
+    def is_ignored(self, source_filename):
+        """`True` if a full build skips the file, because it or one of its
+        folders matches the ``ignore_files`` patterns.
+        """
+        folder = ""
+        for name in source_filename.split(os.path.sep):
+            if not self.filter_files([name], self.get_local_config(folder)):
+                return True
+            folder = os.path.join(folder, name)
+        return False
+
+    def iter_partial_contexts(self, sources, snapshot=None):
+        """Prepares the contexts for `sources` and yields them together
+        with stored contexts for all other files known from the last
+        build.  Ignored sources are not built, and files that were
+        deleted since the last build are left out.  The built sources are
+        added to `snapshot` if one is given.
+        """
+        for source_filename in sorted(sources):
+            if self.is_ignored(source_filename):
+                continue
+            if snapshot is not None:
+                key = stat_file(
+                    os.path.join(self.project_folder, source_filename)
+                )
+                if key is not None:
+                    snapshot["sources"][source_filename] = key
+            yield Context(
+                self,
+                self.get_local_config(os.path.dirname(source_filename)),
+                source_filename,
+                prepare=True,
+            )
+        for source_filename, metadata in self.load_metadata().items():
+            if source_filename in sources or not os.path.isfile(
+                os.path.join(self.project_folder, source_filename)
+            ):
+                continue
+            context = StoredContext(self, source_filename, metadata)
+            context.publish()
+            yield context
+
+    @property
+    def metadata_filename(self):
+        return os.path.join(self.cache.path, "metadata.json")
+
+    def load_metadata(self):
+        try:
+            with io.open(self.metadata_filename, encoding="utf-8") as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+    def save_metadata(self, contexts):
+        metadata = dict(
+            (context.source_filename, context.get_metadata())
+            for context in contexts
+        )
+        self.make_output_folder(self.metadata_filename)
+        with io.open(self.metadata_filename, "w", encoding="utf-8") as f:
+            f.write(json.dumps(metadata, default=str))
+
+    @property
+    def snapshot_filename(self):
+        return os.path.join(self.cache.path, "snapshot.json")
+
+    def get_status(self):
+        """Returns the :class:`~blogdown.snapshot.Status` of the project
+        compared to the last build.  Only the file system is looked at,
+        no source is opened.
+        """
+        return Status(
+            load_snapshot(self.snapshot_filename), take_snapshot(self)
+        )
+
+    def save_snapshot(self, snapshot, sources=None, known=None):
+        """Stores the snapshot taken when a build started.  After a
+        partial build only the entries of the built sources are updated,
+        and sources that are not `known` anymore are dropped.  The included
+        files are the ones recorded by this build.
+        """
+        if sources is not None:
+            previous = load_snapshot(self.snapshot_filename)
+            if previous is None:
+                return
+            if known is not None:
+                previous["sources"] = dict(
+                    (k, v)
+                    for k, v in previous["sources"].items()
+                    if k in known
                 )
+            for source_filename in sources:
+                if source_filename in snapshot["sources"]:
+                    previous["sources"][source_filename] = snapshot[
+                        "sources"
+                    ][source_filename]
+            snapshot = previous
+        snapshot["files"] = stat_dependencies(self)
+        save_snapshot(self.snapshot_filename, snapshot)
 
     def anything_needs_build(self):
+        self._output_entries.clear()
+        self.dependencies.reset()
         for context in self.iter_contexts(prepare=False):
             if context.needs_build:
                 return True
         return False
 
-    def run(self):
+    def start_build(self, partial_build=False):
+        """Resets the state of the last build and returns an empty
+        snapshot, which the walk for the contexts fills before anything
+        is built.
+        """
+        self.partial_build = partial_build
         self.storage.clear()
-        contexts = list(self.iter_contexts())
+        self.invalidate_memos()
+        self.written_files.clear()
+        self.removed_files.clear()
+        self._output_entries.clear()
+        self._output_folders.clear()
+        self._formatted_dates.clear()
+        self.dependencies.reset()
+        self.cache.reset_stats()
+        snapshot = new_snapshot(self)
+        if self.assets is not None:
+            self.assets.scan()
+        before_build_started.send(self)
+        return snapshot
+
+    def build_contexts(self, contexts, sources=None):
+        """Runs the given contexts.  If `sources` are given, exactly the
+        contexts of those files are built, otherwise the ones that need
+        to be built.
+        """
+        # pages link to static files by their fingerprint, so all of them
+        # are stale once one of the fingerprints changed.
+        self.force_rebuild = self.assets is not None and self.assets.changed
+        try:
+            for context in contexts:
+                if sources is not None:
+                    needs_build = context.source_filename in sources
+                else:
+                    needs_build = context.needs_build
+                if needs_build:
+                    key = context.is_new and "A" or "U"
+                    context.run(force=sources is not None)
+                    print(key, context.source_filename)
+        except BaseException:
+            if self.writer is not None:
+                self.writer.wait(raise_errors=False)
+            raise
+        finally:
+            self.force_rebuild = False
+        after_files_built.send(self)
+        self.wait_for_writes()
+        self.mark_phase("build")
+
+    def finish_build(self):
+        """Lets the modules write what depends on all files of the build.
+        What they write is on the disk when this returns.
+        """
+        if self.memory_report is None:
+            before_build_finished.send(self)
+        else:
+            for receiver in before_build_finished.receivers_for(self):
+                receiver(self)
+                self.mark_phase(
+                    "finish %s.%s"
+                    % (receiver.__module__, receiver.__qualname__)
+                )
+        self.wait_for_writes()
+        if self.assets is not None:
+            self.assets.save()
+
+    def precompress_written_files(self):
+        precompress_encodings = self.config.root_get("precompress")
+        if precompress_encodings:
+            self.written_files.update(
+                precompress(self.written_files, precompress_encodings)
+            )
+
+    def finish_cache(self):
+        """Prints the hit rates of a shared cache, lets the minifier collect
+        its values and evicts old values.
+        """
+        # the cache of the project only serves its own rebuilds
+        stats = self.cache.shared and self.cache.iter_stats() or ()
+        for namespace, hits, misses in stats:
+            print(
+                "cache %s: %d of %d hit (%d%%)"
+                % (
+                    namespace,
+                    hits,
+                    hits + misses,
+                    100 * hits // (hits + misses),
+                )
+            )
+        if self.minifier is not None:
+            self.minifier.save(collect=not self.partial_build)
+        self.cache.evict()
+
+    def run(self, sources=None):
+        """Builds the project.  If `sources` (file names relative to the
+        project folder) are given only those files are built, and the
+        metadata stored by the last build stands in for all others.
+        """
+        snapshot = self.start_build(sources is not None)
+        try:
+            if sources is None:
+                contexts = list(self.iter_contexts(snapshot=snapshot))
+            else:
+                sources = set(sources)
+                contexts = list(
+                    self.iter_partial_contexts(sources, snapshot)
+                )
+            self.publish_entries(contexts)
+        except BaseException:
+            if self.writer is not None:
+                self.writer.wait(raise_errors=False)
+            raise
+        self.mark_phase("prepare")
+        self.build_contexts(contexts, sources)
+        self.finish_build()
+
+        # partial builds leave out the sources deleted since the last
+        # build, so their outputs are removed here as well.
+        self.prune_outputs(contexts)
+        known = set(context.source_filename for context in contexts)
+        self.save_metadata(contexts)
+        self.save_snapshot(snapshot, sources, known)
+        self.dependencies.save(known)
+        self.precompress_written_files()
+        self.finish_cache()
+        self.mark_phase("save")
 
+    def run_shard(self, index, count):
+        """Builds shard `index` (counting from 1) of `count`: all files
+        are prepared and published, but only the shard's files are built.
+        What the merge needs to know about them is stored as a partial
+        build in the cache folder; the modules don't finish the build and
+        nothing that is shared by all shards is written.
+        """
+        self.start_build(partial_build=True)
+        try:
+            contexts = list(self.iter_contexts())
+            self.publish_entries(contexts)
+        except BaseException:
+            if self.writer is not None:
+                self.writer.wait(raise_errors=False)
+            raise
+        contexts = [
+            context
+            for context in contexts
+            if get_shard(context.source_filename, count) == index
+        ]
+        self.mark_phase("prepare")
+        self.build_contexts(contexts)
+        # the index pages of the merge show the summaries
         for context in contexts:
-            if context.needs_build:
-                key = context.is_new and "A" or "U"
-                context.run()
-                print(key, context.source_filename)
+            if context.public:
+                context.render_summary()
+        self.precompress_written_files()
+        save_partial(self, index, count, contexts)
+        self.finish_cache()
+        self.mark_phase("save")
+
+    def merge_shards(self, partials=None):
+        """Combines the partial builds of all shards: the modules finish
+        the build once with the stored metadata of all files, and the
+        metadata, dependencies and snapshot of a full build are saved.
+        `partials` are the partial builds if they were already loaded.
+        """
+        if partials is None:
+            partials = load_partials(self)
+        metadata = {}
+        records = {}
+        for shard in partials:
+            metadata.update(shard["metadata"])
+            records.update(
+                (k, v) for k, v in shard["dependencies"].items() if v
+            )
+        # the files were built by the shards, only stored contexts exist
+        self.start_build(partial_build=True)
+        snapshot = take_snapshot(self)
+        contexts = []
+        for source_filename in sorted(metadata):
+            context = StoredContext(
+                self, source_filename, metadata[source_filename]
+            )
+            context.publish()
+            contexts.append(context)
+        self.publish_entries(contexts)
+        self.mark_phase("prepare")
+        self.finish_build()
+
+        self.prune_outputs(contexts)
+        self.save_metadata(contexts)
+        self.dependencies.records = records
+        self.save_snapshot(snapshot)
+        self.dependencies.save(set(metadata))
+        self.precompress_written_files()
+        # the files the shards wrote are part of the delta of the merge
+        for shard in partials:
+            self.written_files.update(
+                os.path.join(self.default_output_folder, filename)
+                for filename in shard["outputs"]
+            )
+        remove_partials(self)
+        self.finish_cache()
+        self.mark_phase("save")
 
-        before_build_finished.send(self)
+    def mark_phase(self, phase):
+        """Records the memory usage at the end of a build phase if a
+        memory report is collected.
+        """
+        if self.memory_report is not None:
+            self.memory_report.mark(phase)
 
     def debug_serve(self, host="127.0.0.1", port=5000):
         from blogdown.server import Server
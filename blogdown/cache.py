@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.cache
+    ~~~~~~~~~~~~~~
+
+    A simple content-addressed cache on the file system that survives
+    between builds.  Values are stored under a namespace (the kind of
+    artifact) and a key that is usually a hash of all inputs.
+
+    The artifacts can be kept in a folder that is shared by many
+    workspaces, like a volume mounted in every CI job, so a fresh
+    checkout reuses the work of earlier builds::
+
+        build_cache: /mnt/blogdown-cache
+        build_cache_size: 2048
+
+    With a shared cache, rendered pages, titles, highlighted code and
+    math images are cached as well.  The size is given in megabytes; once
+    the cache grows beyond it, the least recently used values are evicted
+    at the end of a build.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import tempfile
+from hashlib import sha1
+from time import time
+
+
+CACHE_FOLDER = "_cache"
+
+
+def make_key(*parts):
+    """Returns a hex digest for the given parts (strings or bytes)."""
+    h = sha1()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        h.update(b"%d:" % len(part))
+        h.update(part)
+    return h.hexdigest()
+
+
+class Cache(object):
+    """Stores bytes in ``<artifact_path>/<namespace>/<key[:2]>/<key[2:]>``.
+    `path` is the cache folder of the project, which also holds the state
+    of the last build; `artifact_path` defaults to it.  Hits and misses
+    are counted per namespace.
+    """
+
+    def __init__(self, path, artifact_path=None, max_size=None):
+        self.path = path
+        self.artifact_path = artifact_path or path
+        self.max_size = max_size
+        self.stats = {}
+
+    @property
+    def shared(self):
+        """`True` if the artifacts are kept outside of the project."""
+        return self.artifact_path != self.path
+
+    def get_folder(self, namespace):
+        return os.path.join(self.artifact_path, namespace)
+
+    def get_filename(self, namespace, key):
+        return os.path.join(self.artifact_path, namespace, key[:2], key[2:])
+
+    def get(self, namespace, key):
+        """Returns the cached value or `None`."""
+        rv = self.read(namespace, key)
+        self.count(namespace, rv is not None)
+        return rv
+
+    def read(self, namespace, key):
+        """Like :meth:`get` but the lookup is not counted."""
+        filename = self.get_filename(namespace, key)
+        try:
+            with open(filename, "rb") as f:
+                rv = f.read()
+        except IOError:
+            return None
+        if self.max_size is not None:
+            # the modification time tells the eviction when it was used
+            try:
+                os.utime(filename)
+            except OSError:
+                pass
+        return rv
+
+    def count(self, namespace, hit):
+        """Counts a hit or miss of a lookup in `namespace`."""
+        self.stats.setdefault(namespace, [0, 0])[0 if hit else 1] += 1
+
+    def set(self, namespace, key, value):
+        """Stores a value.  The file is written under a temporary name and
+        renamed, so concurrent builds never see half written values.
+        """
+        filename = self.get_filename(namespace, key)
+        folder = os.path.dirname(filename)
+        if not os.path.isdir(folder):
+            os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, filename)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def collect(self, namespace, keys):
+        """Removes the values in `namespace` whose keys are not in `keys`
+        and returns how many were removed.  A shared cache is left alone:
+        other projects use it as well, it is only evicted by size
+        (:meth:`evict`).
+        """
+        if self.shared:
+            return 0
+        folder = self.get_folder(namespace)
+        removed = 0
+        for dirpath, dirnames, filenames in os.walk(folder):
+            prefix = os.path.basename(dirpath)
+            for filename in filenames:
+                if dirpath != folder and prefix + filename not in keys:
+                    os.remove(os.path.join(dirpath, filename))
+                    removed += 1
+        return removed
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    def iter_stats(self):
+        """Yields ``(namespace, hits, misses)`` sorted by namespace."""
+        for namespace, (hits, misses) in sorted(self.stats.items()):
+            yield namespace, hits, misses
+
+    def evict(self):
+        """Removes the least recently used values until the artifacts fit
+        into `max_size` bytes and returns the number of removed values.
+        """
+        if self.max_size is None:
+            return 0
+        values = []
+        total = 0
+        try:
+            namespaces = os.scandir(self.artifact_path)
+        except OSError:
+            return 0
+        # values are two levels deep, everything else is build state
+        with namespaces:
+            for namespace in namespaces:
+                if not namespace.is_dir():
+                    continue
+                for prefix in os.scandir(namespace.path):
+                    if not prefix.is_dir():
+                        continue
+                    for entry in os.scandir(prefix.path):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        values.append((st.st_mtime, st.st_size, entry.path))
+                        total += st.st_size
+        removed = 0
+        # values written in the last second may still be in use by a
+        # concurrent build.
+        cutoff = time() - 1
+        values.sort()
+        for mtime, size, filename in values:
+            if total <= self.max_size or mtime > cutoff:
+                break
+            try:
+                os.remove(filename)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
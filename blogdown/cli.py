@@ -10,12 +10,17 @@
 """
 import sys
 import os
+import argparse
+from blogdown import daemon
 from blogdown.config import Config
-from blogdown.builder import Builder
+from blogdown.shards import load_partials, parse_shard
 
 
 def get_builder(project_folder):
     """Runs the builder for the given project folder."""
+    # imported here so that handing a build to the daemon stays cheap
+    from blogdown.builder import Builder
+
     config_filename = os.path.join(project_folder, "config.yml")
     config = Config()
     if not os.path.isfile(config_filename):
@@ -25,23 +30,185 @@ def get_builder(project_folder):
     return Builder(project_folder, config)
 
 
-def main():
-    """Entrypoint for the console script."""
-    if len(sys.argv) not in (1, 2, 3):
-        print("usage: blogdown <action> <folder>", file=sys.stderr)
-    if len(sys.argv) >= 2:
-        action = sys.argv[1]
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="blogdown", description="a simple static blog generator"
+    )
+    parser.add_argument(
+        "action",
+        nargs="?",
+        default="build",
+        choices=("build", "serve", "daemon", "status", "merge"),
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="the project folder (defaults to the current folder), or "
+        "source files to build",
+    )
+    parser.add_argument(
+        "--project",
+        help="the project folder, if source files are given",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="build only the files of shard I of N, to be combined with "
+        "the other shards by merge",
+    )
+    parser.add_argument(
+        "--memory-report",
+        nargs="?",
+        const="",
+        metavar="FILE",
+        help="report the memory used by each phase of the build, and "
+        "write the report as JSON to FILE if given",
+    )
+    parser.add_argument(
+        "--emit-delta",
+        metavar="FOLDER",
+        help="write the lists of output files the build changed and "
+        "deleted to FOLDER",
+    )
+    parser.add_argument(
+        "--delta-tarball",
+        action="store_true",
+        help="also pack the changed output files into a tarball",
+    )
+    return parser
+
+
+def parse_args(parser, argv=None):
+    args = parser.parse_args(argv)
+
+    args.sources = None
+    if args.project is not None:
+        args.folder = args.project
+        args.sources = args.paths
+    elif len(args.paths) == 1 and os.path.isdir(args.paths[0]):
+        args.folder = args.paths[0]
+    else:
+        args.folder = os.getcwd()
+        args.sources = args.paths
+    if args.sources:
+        if args.action != "build":
+            parser.error("source files can only be given to build")
+        args.sources = [
+            get_source_filename(args.folder, path) for path in args.sources
+        ]
+        for source, path in zip(args.sources, args.paths):
+            if not os.path.isfile(path):
+                parser.error("%s is not a file" % path)
+            if source.startswith(os.pardir):
+                parser.error("%s is not in the project folder" % path)
     else:
-        action = "build"
-    if len(sys.argv) >= 3:
-        folder = sys.argv[2]
+        args.sources = None
+    if args.shard is not None:
+        if args.action != "build" or args.sources:
+            parser.error("--shard can only be given to build a project")
+        try:
+            args.shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.memory_report is not None and args.action not in (
+        "build",
+        "merge",
+    ):
+        parser.error("--memory-report can only be given to build or merge")
+    if args.emit_delta is not None and args.action not in ("build", "merge"):
+        parser.error("--emit-delta can only be given to build or merge")
+    if args.delta_tarball and args.emit_delta is None:
+        parser.error("--delta-tarball requires --emit-delta")
+    return args
+
+
+def get_source_filename(project_folder, path):
+    return os.path.relpath(
+        os.path.abspath(path), os.path.abspath(project_folder)
+    )
+
+
+def run(builder, args):
+    if args.action == "merge":
+        builder.merge_shards(args.partials)
+    elif args.shard is not None:
+        builder.run_shard(*args.shard)
     else:
-        folder = os.getcwd()
-    if action not in ("build", "serve"):
-        print("unknown action", action, file=sys.stderr)
-    builder = get_builder(folder)
+        builder.run(args.sources)
+
+
+def run_with_memory_report(project_folder, args, filename):
+    """Builds in this process (never in the daemon) and prints the
+    memory used by every phase.
+    """
+    from blogdown.memory import MemoryReport
+
+    report = MemoryReport()
+    report.start()
+    try:
+        builder = get_builder(project_folder)
+        report.mark("setup")
+        builder.memory_report = report
+        run(builder, args)
+    finally:
+        report.stop()
+    print(report.format_text())
+    if filename:
+        with open(filename, "w") as f:
+            f.write(report.to_json() + "\n")
+    return builder
+
+
+def main():
+    """Entrypoint for the console script."""
+    parser = get_parser()
+    args = parse_args(parser)
+    folder = args.folder
+    builder = None
+
+    if args.action == "merge":
+        # report missing or incomplete shards before anything is merged
+        builder = get_builder(folder)
+        try:
+            args.partials = load_partials(builder)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.action in ("build", "merge"):
+        # reports, deltas, shards and merges need the state of the
+        # builder, so those builds never go to the daemon.
+        if (
+            args.action == "build"
+            and args.shard is None
+            and args.memory_report is None
+            and args.emit_delta is None
+        ):
+            rv = daemon.request(folder, sources=args.sources)
+            if rv is not None:
+                sys.exit(0 if rv else 1)
+        if args.memory_report is not None:
+            builder = run_with_memory_report(folder, args, args.memory_report)
+        else:
+            builder = builder or get_builder(folder)
+            run(builder, args)
+        if args.emit_delta is not None:
+            from blogdown.delta import write_delta
 
-    if action == "build":
-        builder.run()
+            changed, deleted = write_delta(
+                builder, args.emit_delta, args.delta_tarball
+            )
+            print("%d changed, %d deleted" % (len(changed), len(deleted)))
+    elif args.action == "daemon":
+        server = daemon.Daemon(folder, get_builder)
+        print("Daemon listening on", server.server_address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.action == "status":
+        status = get_builder(folder).get_status()
+        for line in status.iter_lines():
+            print(line)
+        sys.exit(0 if status.clean else 1)
     else:
-        builder.debug_serve()
+        get_builder(folder).debug_serve()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.compress
+    ~~~~~~~~~~~~~~~~~
+
+    Writes precompressed siblings (``.gz`` and ``.zst``) of the files
+    written in a build so that web servers can serve them directly, for
+    example with nginx's ``gzip_static``.
+
+    To enable it, list the wanted encodings in the root ``config.yml``::
+
+        precompress: [gzip, zstd]
+
+    ``zstd`` requires the ``zstandard`` package and is skipped silently
+    if it is not installed.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+compressible_extensions = frozenset(
+    [
+        ".html",
+        ".htm",
+        ".css",
+        ".js",
+        ".json",
+        ".atom",
+        ".xml",
+        ".svg",
+        ".txt",
+    ]
+)
+
+
+def compress_gzip(data):
+    # a fixed mtime and no filename in the header keep the output stable
+    # for unchanged inputs.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_zstd(data):
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+
+#: encoding name -> (file suffix, compression function)
+encodings = {
+    "gzip": (".gz", compress_gzip),
+    "zstd": (".zst", compress_zstd),
+}
+
+
+def get_encodings(names):
+    """Returns the ``(encoding, suffix, function)`` tuples for the given
+    encoding names, leaving out those that are not available.
+    """
+    rv = []
+    for name in names:
+        if name not in encodings:
+            raise ValueError("unknown precompress encoding %r" % name)
+        if name == "zstd" and zstandard is None:
+            continue
+        suffix, func = encodings[name]
+        rv.append((name, suffix, func))
+    return rv
+
+
+def is_compressible(filename):
+    return os.path.splitext(filename)[1].lower() in compressible_extensions
+
+
+def write_siblings(filename, encodings):
+    with open(filename, "rb") as f:
+        data = f.read()
+    rv = []
+    for name, suffix, func in encodings:
+        with open(filename + suffix, "wb") as f:
+            f.write(func(data))
+        rv.append(filename + suffix)
+    return rv
+
+
+def precompress(filenames, names, workers=None):
+    """Writes precompressed siblings for all compressible files in
+    `filenames` in parallel and returns their file names.  The
+    compressors release the GIL, so a thread pool is enough.
+    """
+    encodings = get_encodings(names)
+    filenames = sorted(f for f in filenames if is_compressible(f))
+    rv = []
+    if not encodings or not filenames:
+        return rv
+    with ThreadPoolExecutor(workers) as executor:
+        for future in [
+            executor.submit(write_siblings, filename, encodings)
+            for filename in filenames
+        ]:
+            rv.extend(future.result())
+    return rv
+
+
+def get_precompressed(filename, accept_encoding):
+    """Returns ``(encoding, filename)`` of an up-to-date precompressed
+    sibling of `filename` the client accepts, or `None`.
+    """
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q=") and not params[2:].strip("0."):
+            continue
+        accepted.add(name.strip().lower())
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        return
+    for name in ("zstd", "gzip"):
+        if name not in accepted:
+            continue
+        sibling = filename + encodings[name][0]
+        try:
+            if os.path.getmtime(sibling) >= mtime:
+                return name, sibling
+        except OSError:
+            pass
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.daemon
+    ~~~~~~~~~~~~~~~
+
+    A build daemon that keeps a builder warm (loaded plugins, compiled
+    templates, parsed configuration and prepared contexts) and builds on
+    request from ``blogdown build`` over a local unix socket.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import sys
+import json
+import socket
+import traceback
+import socketserver
+from hashlib import sha1
+from contextlib import redirect_stdout
+
+from blogdown.cache import CACHE_FOLDER
+
+
+def get_socket_path(project_folder):
+    """Returns the socket path of the daemon for a project folder.  The
+    socket lives in the private runtime folder of the user if there is
+    one (socket paths are limited to about a hundred characters), and in
+    the ``_cache`` folder of the project otherwise.  It is never put into the
+    shared temp folder where other users could take its place.
+    """
+    project_folder = os.path.abspath(project_folder)
+    runtime_folder = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_folder:
+        digest = sha1(project_folder.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(runtime_folder, "blogdown-%s.sock" % digest)
+    return os.path.join(project_folder, CACHE_FOLDER, "daemon.sock")
+
+
+def send_message(f, **message):
+    f.write(json.dumps(message).encode("utf-8") + b"\n")
+    f.flush()
+
+
+def request(project_folder, action="build", **options):
+    """Asks the daemon for `project_folder` to run `action`.  Output of
+    the daemon is printed.  Returns `True` on success, `False` if the
+    daemon reported an error and `None` if no daemon could be reached,
+    in which case the caller builds in its own process.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(get_socket_path(project_folder))
+    except OSError:
+        sock.close()
+        return None
+    try:
+        with sock, sock.makefile("rwb") as f:
+            send_message(f, action=action, **options)
+            for line in f:
+                message = json.loads(line.decode("utf-8"))
+                if "output" in message:
+                    sys.stdout.write(message["output"])
+                if "error" in message:
+                    sys.stderr.write(message["error"])
+                if "status" in message:
+                    return message["status"] == "ok"
+    except OSError:
+        return None
+    return False
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            message = json.loads(self.rfile.readline().decode("utf-8"))
+        except ValueError:
+            return
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                self.server.dispatch(message)
+        except Exception:
+            send_message(
+                self.wfile,
+                output=output.getvalue(),
+                error=traceback.format_exc(),
+                status="error",
+            )
+        else:
+            send_message(self.wfile, output=output.getvalue(), status="ok")
+
+
+class Daemon(socketserver.UnixStreamServer):
+    """Serves build requests for a project folder one at a time.  The
+    builder is created again if the root ``config.yml`` changed.
+    """
+
+    def __init__(self, project_folder, get_builder):
+        self.project_folder = os.path.abspath(project_folder)
+        self.get_builder = get_builder
+        self.builder = None
+        self.config_stat = None
+        path = get_socket_path(self.project_folder)
+        if os.path.exists(path):
+            if request(self.project_folder, "ping") is not None:
+                raise RuntimeError("a daemon is already running")
+            os.unlink(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        socketserver.UnixStreamServer.__init__(
+            self, path, DaemonRequestHandler
+        )
+
+    def get_warm_builder(self):
+        st = os.stat(os.path.join(self.project_folder, "config.yml"))
+        config_stat = (st.st_mtime_ns, st.st_size)
+        if self.builder is None or config_stat != self.config_stat:
+            self.builder = self.get_builder(self.project_folder)
+            self.builder.enable_context_cache()
+            self.config_stat = config_stat
+        return self.builder
+
+    def dispatch(self, message):
+        action = message.get("action")
+        if action == "ping":
+            return
+        if action == "build":
+            self.get_warm_builder().run(message.get("sources"))
+        else:
+            raise ValueError("unknown action %r" % action)
+
+    def serve_forever(self, *args, **kwargs):
+        # warm up with a first build before accepting requests
+        self.get_warm_builder().run()
+        try:
+            socketserver.UnixStreamServer.serve_forever(self, *args, **kwargs)
+        finally:
+            self.server_close()
+            os.unlink(self.server_address)
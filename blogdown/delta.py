@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.delta
+    ~~~~~~~~~~~~~~
+
+    Deploy deltas for ``blogdown build --emit-delta FOLDER``.  After the
+    build the folder holds ``changed.txt`` with the output files the build
+    wrote and ``deleted.txt`` with the ones it removed, one path relative
+    to the output folder per line.  With ``--delta-tarball`` the changed
+    files are also packed into ``changed.tar.gz``, so a deploy only has to
+    ship what actually changed instead of syncing the whole tree.
+
+    Files that were written with the same contents they already had (like
+    feeds whose entries didn't change) are not part of the delta.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import tarfile
+
+
+def get_relative_names(builder, filenames):
+    folder = builder.default_output_folder
+    return sorted(
+        os.path.relpath(filename, folder).replace(os.path.sep, "/")
+        for filename in filenames
+    )
+
+
+def get_delta(builder):
+    """Returns the sorted changed and deleted output files of the last
+    build, relative to the output folder.
+    """
+    changed = [f for f in builder.written_files if os.path.isfile(f)]
+    deleted = builder.removed_files.difference(builder.written_files)
+    return (
+        get_relative_names(builder, changed),
+        get_relative_names(builder, deleted),
+    )
+
+
+def write_list(filename, names):
+    with io.open(filename, "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(name + "\n")
+
+
+def write_tarball(builder, filename, names):
+    folder = builder.default_output_folder
+    with tarfile.open(filename, "w:gz") as tar:
+        for name in names:
+            tar.add(os.path.join(folder, name), arcname=name)
+
+
+def write_delta(builder, folder, tarball=False):
+    """Writes the delta of the last build of `builder` to `folder` and
+    returns the changed and deleted file names.
+    """
+    changed, deleted = get_delta(builder)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    write_list(os.path.join(folder, "changed.txt"), changed)
+    write_list(os.path.join(folder, "deleted.txt"), deleted)
+    if tarball:
+        write_tarball(builder, os.path.join(folder, "changed.tar.gz"), changed)
+    return changed, deleted
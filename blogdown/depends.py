@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.depends
+    ~~~~~~~~~~~~~~~~
+
+    Dependencies of the built files.  Every template rendered for a
+    context is recorded (through :data:`before_template_rendered`) and the
+    templates it extends, includes or imports are found in its AST.  Files
+    read by directives are registered with
+    :meth:`~blogdown.builder.Context.add_dependency`.  Digests of the stat
+    results of both are stored with each source, and a source is built
+    again when one of them changed, so editing a template or an included
+    file rebuilds exactly the pages that use it.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import json
+
+from jinja2 import TemplateNotFound, meta
+
+from blogdown.cache import make_key
+
+
+def record_template(template, context):
+    """Receiver for :data:`before_template_rendered` that records the
+    template on the context it is rendered for.
+    """
+    templates = getattr(context.get("ctx"), "templates", None)
+    if templates is not None and template.name is not None:
+        templates.add(template.name)
+
+
+class DependencyIndex(object):
+    """The recorded dependencies of every source, stored in the cache
+    folder between builds.
+    """
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.filename = os.path.join(builder.cache.path, "depends.json")
+        self.records = None
+        self._closures = {}
+        self._digests = {}
+
+    def reset(self):
+        """Forgets the template state, called when a build starts."""
+        self._closures.clear()
+        self._digests.clear()
+
+    def load(self):
+        try:
+            with io.open(self.filename, encoding="utf-8") as f:
+                self.records = json.load(f)
+        except (IOError, ValueError):
+            self.records = {}
+
+    def get_closure(self, template_name):
+        """Returns the names of `template_name` and all the templates it
+        references.  References with dynamic names are not followed.
+        """
+        rv = self._closures.get(template_name)
+        if rv is not None:
+            return rv
+        env = self.builder.jinja_env
+        rv = set()
+        pending = [template_name]
+        while pending:
+            name = pending.pop()
+            if name in rv:
+                continue
+            rv.add(name)
+            try:
+                source = env.loader.get_source(env, name)[0]
+            except TemplateNotFound:
+                continue
+            for ref in meta.find_referenced_templates(env.parse(source)):
+                if ref is not None:
+                    pending.append(ref)
+        rv = self._closures[template_name] = frozenset(rv)
+        return rv
+
+    def get_template_state(self, name):
+        env = self.builder.jinja_env
+        try:
+            filename = env.loader.get_source(env, name)[1]
+            st = os.stat(filename)
+        except (TemplateNotFound, OSError):
+            return "%s:missing" % name
+        return "%s:%s:%d:%d" % (name, filename, st.st_size, st.st_mtime_ns)
+
+    def get_digest(self, templates):
+        """Returns the digest of the closure of `templates`."""
+        key = tuple(sorted(templates))
+        rv = self._digests.get(key)
+        if rv is None:
+            closure = set()
+            for name in key:
+                closure.update(self.get_closure(name))
+            rv = self._digests[key] = make_key(
+                *[self.get_template_state(name) for name in sorted(closure)]
+            )
+        return rv
+
+    def get_files_digest(self, filenames):
+        """Returns the digest of the files a source depends on."""
+        states = []
+        for filename in sorted(filenames):
+            try:
+                st = os.stat(filename)
+            except OSError:
+                states.append("%s:missing" % filename)
+            else:
+                states.append(
+                    "%s:%d:%d" % (filename, st.st_size, st.st_mtime_ns)
+                )
+        return make_key(*states)
+
+    def get_record(self, source_filename):
+        if self.records is None:
+            self.load()
+        return self.records.get(source_filename)
+
+    def iter_files(self):
+        """Yields every file a recorded source depends on once."""
+        if self.records is None:
+            self.load()
+        seen = set()
+        for record in self.records.values():
+            for filename in record.get("files", ()):
+                if filename not in seen:
+                    seen.add(filename)
+                    yield filename
+
+    def files_changed(self, source_filename):
+        """`True` if a file the source depends on changed since it was
+        built.
+        """
+        record = self.get_record(source_filename)
+        return record is not None and record.get(
+            "files_digest"
+        ) != self.get_files_digest(record.get("files", ()))
+
+    def is_stale(self, context):
+        """`True` if the dependencies of a context changed since it was
+        built or are unknown.
+        """
+        record = self.get_record(context.source_filename)
+        if record is None:
+            return True
+        return record["digest"] != self.get_digest(
+            record["templates"]
+        ) or self.files_changed(context.source_filename)
+
+    def update(self, context):
+        """Records the dependencies of a context that was just built."""
+        if self.records is None:
+            self.load()
+        self.records[context.source_filename] = {
+            "templates": sorted(context.templates),
+            "digest": self.get_digest(context.templates),
+            "files": sorted(context.included_files),
+            "files_digest": self.get_files_digest(context.included_files),
+        }
+
+    def save(self, sources=None):
+        """Stores the records.  If the names of all `sources` are given,
+        records of sources that are gone are dropped.
+        """
+        if self.records is None:
+            return
+        if sources is not None:
+            self.records = dict(
+                (k, v) for k, v in self.records.items() if k in sources
+            )
+        folder = os.path.dirname(self.filename)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with io.open(self.filename, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.records, sort_keys=True))
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.fragments
+    ~~~~~~~~~~~~~~~~~~
+
+    A ``{% cache %}`` tag for template fragments that are the same on
+    many pages, like a sidebar with the recent entries::
+
+        {% cache "sidebar" %}
+          {% for entry in get_recent_blog_entries() %}...{% endfor %}
+        {% endcache %}
+
+    Any number of key expressions can be given (``{% cache "nav",
+    config.locale %}``).  The fragment is rendered once per key and build;
+    it is dropped together with the other memoized values of the builder.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+from jinja2 import nodes, pass_context
+from jinja2.ext import Extension
+
+from blogdown.cache import make_key
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render_cached", [nodes.List(key)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    @pass_context
+    def _render_cached(self, context, key, caller):
+        builder = context.get("builder")
+        if builder is None:
+            return caller()
+        key = make_key(*[str(part) for part in key])
+        return builder.memoize(("fragment", key), caller)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.memory
+    ~~~~~~~~~~~~~~~
+
+    Memory reports for ``blogdown build --memory-report``.  At the
+    boundaries of the build phases (setup, preparing the files, building
+    them, every receiver of ``before_build_finished`` and saving the
+    state) a tracemalloc snapshot is taken and the peak RSS of the process
+    is recorded, together with the number of live contexts, configs and
+    programs.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import gc
+import sys
+import json
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+#: classes whose live instances are counted, subclasses included
+counted_types = (
+    ("blogdown.builder", "Context"),
+    ("blogdown.builder", "StoredContext"),
+    ("blogdown.config", "Config"),
+    ("blogdown.programs", "Program"),
+)
+
+_ignored_files = (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+
+
+def get_peak_rss():
+    """Returns the peak resident set size of the process in bytes or
+    `None` if it is not known on this platform.
+    """
+    if resource is None:
+        return None
+    rv = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes everywhere but on macOS
+    if sys.platform != "darwin":
+        rv *= 1024
+    return rv
+
+
+def count_objects():
+    classes = []
+    for module_name, name in counted_types:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            classes.append(getattr(module, name))
+    classes = tuple(classes)
+    rv = {}
+    for obj in gc.get_objects():
+        if isinstance(obj, classes):
+            name = type(obj).__name__
+            rv[name] = rv.get(name, 0) + 1
+    return rv
+
+
+def format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return "%.1f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GiB" % size
+
+
+class MemoryReport(object):
+    """Collects the memory usage of a build phase by phase."""
+
+    def __init__(self, top=10):
+        self.top = top
+        self.phases = []
+        self._snapshot = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        tracemalloc.stop()
+        self._snapshot = None
+
+    def mark(self, phase):
+        """Records the state at the end of `phase`.  The allocation sites
+        listed are the ones that grew the most during the phase.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, name) for name in _ignored_files]
+        )
+        if self._snapshot is None:
+            stats = snapshot.statistics("lineno")
+        else:
+            stats = snapshot.compare_to(self._snapshot, "lineno")
+        self._snapshot = snapshot
+        top = []
+        for stat in stats[: self.top]:
+            frame = stat.traceback[0]
+            top.append(
+                {
+                    "site": "%s:%d" % (frame.filename, frame.lineno),
+                    "size": stat.size,
+                    "count": stat.count,
+                    "size_diff": getattr(stat, "size_diff", stat.size),
+                }
+            )
+        self.phases.append(
+            {
+                "phase": phase,
+                "traced": current,
+                "traced_peak": peak,
+                "peak_rss": get_peak_rss(),
+                "objects": count_objects(),
+                "top": top,
+            }
+        )
+        tracemalloc.reset_peak()
+
+    def to_json(self):
+        return json.dumps({"phases": self.phases}, indent=2)
+
+    def format_text(self):
+        lines = []
+        for phase in self.phases:
+            line = "%s: traced %s (peak %s)" % (
+                phase["phase"],
+                format_size(phase["traced"]),
+                format_size(phase["traced_peak"]),
+            )
+            if phase["peak_rss"] is not None:
+                line += ", peak RSS %s" % format_size(phase["peak_rss"])
+            lines.append(line)
+            if phase["objects"]:
+                lines.append(
+                    "  objects: "
+                    + ", ".join(
+                        "%s %d" % item
+                        for item in sorted(phase["objects"].items())
+                    )
+                )
+            for site in phase["top"]:
+                size_diff = format_size(site["size_diff"])
+                if site["size_diff"] > 0:
+                    size_diff = "+" + size_diff
+                lines.append(
+                    "  %11s %10s %8d blocks  %s"
+                    % (
+                        size_diff,
+                        format_size(site["size"]),
+                        site["count"],
+                        site["site"],
+                    )
+                )
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.minify
+    ~~~~~~~~~~~~~~~
+
+    Conservative minifiers for the HTML, CSS and Atom files written in a
+    build.  They only drop what cannot change how a document renders:
+    comments and redundant whitespace.  ``<pre>``, ``<textarea>`` and
+    ``<script>`` blocks are kept as they are, ``<style>`` blocks are
+    minified as CSS.
+
+    Enable it in the root ``config.yml``, either for everything or only
+    for some of the file types::
+
+        minify: yes
+        minify: [html, css, xml]
+
+    Minified results are cached by the hash of their input.  The cache
+    remembers which output file every value was written to, and values no
+    existing output file was minified from are removed after full builds.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import re
+import json
+
+from blogdown.cache import make_key
+
+
+_html_protected_re = re.compile(
+    r"(<(pre|textarea|script|style)\b.*?</\2\s*>)", re.I | re.S
+)
+_html_comment_re = re.compile(r"<!--(?!\[if|<!|>).*?-->", re.S)
+_whitespace_re = re.compile(r"\s+")
+_css_tokens_re = re.compile(
+    r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(/\*(?!!).*?\*/)""", re.S
+)
+_css_space_re = re.compile(r"\s*([{};,>])\s*")
+_xml_space_re = re.compile(r">\s*\n\s*<")
+
+
+def _collapse_whitespace(match):
+    return "\n" if "\n" in match.group() else " "
+
+
+def minify_html(text):
+    rv = []
+    pos = 0
+    for match in _html_protected_re.finditer(text):
+        rv.append(_minify_html_text(text[pos:match.start()]))
+        block = match.group(1)
+        if match.group(2).lower() == "style":
+            start = block.index(">") + 1
+            end = block.rindex("<")
+            block = block[:start] + minify_css(block[start:end]) + block[end:]
+        rv.append(block)
+        pos = match.end()
+    rv.append(_minify_html_text(text[pos:]))
+    return "".join(rv)
+
+
+def _minify_html_text(text):
+    text = _html_comment_re.sub("", text)
+    return _whitespace_re.sub(_collapse_whitespace, text)
+
+
+def minify_css(text):
+    rv = []
+    pos = 0
+    for match in _css_tokens_re.finditer(text):
+        rv.append(_minify_css_text(text[pos:match.start()]))
+        if match.group(1) is not None:
+            rv.append(match.group(1))
+        pos = match.end()
+    rv.append(_minify_css_text(text[pos:]))
+    return "".join(rv).replace(";}", "}").strip()
+
+
+def _minify_css_text(text):
+    text = _whitespace_re.sub(" ", text)
+    return _css_space_re.sub(r"\1", text)
+
+
+def minify_xml(text):
+    return _xml_space_re.sub("><", text)
+
+
+#: file type -> (extensions, minifier)
+minifiers = {
+    "html": ((".html", ".htm"), minify_html),
+    "css": ((".css",), minify_css),
+    "xml": ((".atom", ".xml"), minify_xml),
+}
+
+
+class Minifier(object):
+    """Output filter that minifies the files it knows about."""
+
+    def __init__(self, builder, types=None):
+        self.builder = builder
+        self.filename = os.path.join(builder.cache.path, "minify.json")
+        #: output file -> cache key of the files minified in this build
+        self.keys = {}
+        self.by_extension = {}
+        for name, (extensions, func) in minifiers.items():
+            if types is None or name in types:
+                for ext in extensions:
+                    self.by_extension[ext] = (name, func)
+
+    def __call__(self, filename, contents):
+        ext = os.path.splitext(filename)[1].lower()
+        if ext not in self.by_extension:
+            return contents
+        name, func = self.by_extension[ext]
+        cache = self.builder.cache
+        key = make_key(name, contents)
+        self.keys[
+            os.path.relpath(filename, self.builder.project_folder)
+        ] = key
+        rv = cache.get("minify", key)
+        if rv is not None:
+            return rv.decode("utf-8")
+        rv = func(contents)
+        if not rv.endswith("\n"):
+            rv += "\n"
+        cache.set("minify", key, rv.encode("utf-8"))
+        return rv
+
+    def save(self, collect=False):
+        """Stores the cache keys of the output files.  If `collect` is set
+        (after a full build) values that no existing output file refers
+        to are removed from the cache.
+        """
+        try:
+            with io.open(self.filename, encoding="utf-8") as f:
+                keys = json.load(f)
+        except (IOError, ValueError):
+            keys = {}
+        keys.update(self.keys)
+        self.keys.clear()
+        if collect:
+            folder = self.builder.project_folder
+            keys = dict(
+                (filename, key)
+                for filename, key in keys.items()
+                if os.path.isfile(os.path.join(folder, filename))
+            )
+            self.builder.cache.collect("minify", set(keys.values()))
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        # shards running in parallel save it as well
+        tmp = "%s.%d.tmp" % (self.filename, os.getpid())
+        with io.open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(keys, sort_keys=True))
+        os.replace(tmp, self.filename)
@@ -10,16 +10,17 @@
 """
 
 from datetime import datetime, date
-from urllib.parse import urljoin
+from functools import lru_cache
 
 from pytz import timezone
 
 from jinja2 import pass_context
 
 from werkzeug.routing import Rule, Map, NotFound
-from feedgen.feed import FeedGenerator
 
-from blogdown.signals import after_file_published, before_build_finished
+from blogdown import atom
+from blogdown.plugin import BatchHook
+from blogdown.signals import before_build_finished
 from blogdown.utils import Pagination
 
 
@@ -53,37 +54,81 @@ class YearArchive(object):
         self.count = sum(len(x.entries) for x in self.months)
 
 
-def test_pattern(path, pattern):
+@lru_cache(maxsize=None)
+def compile_pattern(pattern):
+    """Returns a URL adapter matching slugs against a pub date pattern.
+    Each distinct pattern is only compiled once.
+    """
     pattern = "/" + pattern.strip("/") + "/<path:extra>"
-    adapter = Map([Rule(pattern)]).bind("dummy.invalid")
+    return Map([Rule(pattern)]).bind("dummy.invalid")
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    return timezone(name)
+
+
+def test_pattern(path, pattern):
     try:
-        endpoint, values = adapter.match(path.strip("/"))
+        endpoint, values = compile_pattern(pattern).match(path.strip("/"))
     except NotFound:
         return
     return values["year"], values["month"], values["day"]
 
 
-def process_blog_entry(context):
-    if context.pub_date is None:
-        pattern = context.config.get(
-            "modules.blog.pub_date_match", "/<int:year>/<int:month>/<int:day>/"
-        )
-        tz = timezone(context.config.get("timezone"))
-        if pattern is not None:
-            rv = test_pattern(context.slug, pattern)
-            if rv is not None:
-                context.pub_date = datetime(*rv, tzinfo=tz)
+class BlogEntries(BatchHook):
+    """Derives missing publication dates from the paths of the entries
+    and sorts the entries into the archive.
+    """
 
-    if context.pub_date is None or context.title is None:
-        return
+    parallel_safe = True
 
-    context.builder.get_storage("blog").setdefault(
-        context.pub_date.year, {}
-    ).setdefault(("0%d" % context.pub_date.month)[-2:], []).append(context)
+    def extract(self, context):
+        pattern = None
+        if context.pub_date is None:
+            pattern = context.config.get(
+                "modules.blog.pub_date_match",
+                "/<int:year>/<int:month>/<int:day>/",
+            )
+        return context.source_filename, context.slug, pattern
+
+    def map(self, items):
+        rv = {}
+        for source_filename, slug, pattern in items:
+            if pattern is not None:
+                match = test_pattern(slug, pattern)
+                if match is not None:
+                    rv[source_filename] = match
+        return rv
+
+    def merge(self, results):
+        rv = {}
+        for result in results:
+            rv.update(result)
+        return rv
+
+    def apply(self, builder, entries, result):
+        storage = builder.get_storage("blog")
+        for context in entries:
+            match = result.get(context.source_filename)
+            if match is not None:
+                tz = get_timezone(context.config.get("timezone"))
+                context.pub_date = datetime(*match, tzinfo=tz)
+            if context.pub_date is None or context.title is None:
+                continue
+            storage.setdefault(context.pub_date.year, {}).setdefault(
+                ("0%d" % context.pub_date.month)[-2:], []
+            ).append(context)
 
 
 def get_all_entries(builder):
-    """Returns all blog entries in reverse order"""
+    """Returns all blog entries in reverse order.  The list is computed
+    once per build and shared, it must not be modified.
+    """
+    return builder.memoize("blog.all_entries", sort_entries, builder)
+
+
+def sort_entries(builder):
     result = []
     storage = builder.get_storage("blog")
     for year, months in storage.items():
@@ -115,7 +160,9 @@ def write_index_page(builder):
     entries = get_all_entries(builder)
     pagination = Pagination(builder, entries, 1, per_page, "blog_index")
     while 1:
-        with builder.open_link_file("blog_index", page=pagination.page) as f:
+        with builder.open_link_file(
+            "blog_index", only_if_changed=True, page=pagination.page
+        ) as f:
             rv = builder.render_template(
                 "blog/index.html",
                 {"pagination": pagination, "show_pagination": use_pagination},
@@ -128,19 +175,24 @@ def write_index_page(builder):
 
 def write_archive_pages(builder):
     archive = get_archive_summary(builder)
-    with builder.open_link_file("blog_archive") as f:
+    with builder.open_link_file("blog_archive", only_if_changed=True) as f:
         rv = builder.render_template("blog/archive.html", {"archive": archive})
         f.write(rv + "\n")
 
     for entry in archive:
-        with builder.open_link_file("blog_archive", year=entry.year) as f:
+        with builder.open_link_file(
+            "blog_archive", only_if_changed=True, year=entry.year
+        ) as f:
             rv = builder.render_template(
                 "blog/year_archive.html", {"entry": entry}
             )
             f.write(rv + "\n")
         for subentry in entry.months:
             with builder.open_link_file(
-                "blog_archive", year=entry.year, month=subentry.month
+                "blog_archive",
+                only_if_changed=True,
+                year=entry.year,
+                month=subentry.month,
             ) as f:
                 rv = builder.render_template(
                     "blog/month_archive.html", {"entry": subentry}
@@ -149,28 +201,7 @@ def write_archive_pages(builder):
 
 
 def write_feed(builder):
-    blog_author = builder.config.root_get("author")
-    url = builder.config.root_get("canonical_url") or "http://localhost/"
-    name = builder.config.get("feed.name") or "Recent Blog Posts"
-    subtitle = builder.config.get("feed.subtitle") or "Recent blog posts"
-    feed_url = urljoin(url, builder.link_to("blog_feed"))
-    feed = FeedGenerator()
-    feed.id(feed_url)
-    feed.link(href=url)
-    feed.link(href=feed_url, rel="self")
-    feed.title(name)
-    feed.subtitle(subtitle)
-
-    for entry in get_all_entries(builder)[:10]:
-        fe = feed.add_entry()
-        fe.id(urljoin(url, entry.slug))
-        fe.link(href=fe.id(), rel="self")
-        fe.title(entry.title)
-        fe.content(entry.render_contents(), type="html")
-        fe.author(name=blog_author)
-        fe.updated(entry.pub_date)
-    with builder.open_link_file("blog_feed") as f:
-        f.write(feed.atom_str().decode("utf-8") + "\n")
+    atom.write_feed(builder, get_all_entries(builder)[:10], "blog_feed")
 
 
 def write_blog_files(builder):
@@ -180,7 +211,7 @@ def write_blog_files(builder):
 
 
 def setup(builder):
-    after_file_published.connect(process_blog_entry)
+    builder.register_batch_hook(BlogEntries())
     before_build_finished.connect(write_blog_files)
     builder.register_url(
         "blog_index",
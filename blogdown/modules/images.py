@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.modules.images
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    Responsive images.  Activating this module registers the ``image``
+    program, which copies an image like the ``copy`` program does and
+    additionally writes resized derivatives next to it
+    (``photo-480w.jpg``, ``photo-960w.jpg``, ...).  Map image files to it
+    in your ``config.yml``::
+
+        active_modules: [images]
+        programs:
+          "*.jpg": image
+          "*.png": image
+        image_widths: [480, 960, 1600]
+        image_quality: 80
+
+    Only widths smaller than the original are generated.  Templates can
+    get ``src``, ``srcset``, ``width`` and ``height`` for an image with
+    ``get_image('/2022/02/02/photo.jpg')``.
+
+    Derivatives are rendered in a process pool and stored in the build
+    cache keyed by the hash of the source and the parameters, so each of
+    them is only ever generated once.  Cache entries of removed or changed
+    sources are collected at the end of a build.  Requires Pillow.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import json
+import posixpath
+from hashlib import sha1
+from concurrent.futures import ProcessPoolExecutor
+
+from jinja2 import pass_context
+
+from blogdown.cache import make_key
+from blogdown.programs import CopyProgram
+from blogdown.signals import (
+    after_file_prepared,
+    after_files_built,
+    before_build_finished,
+)
+
+
+default_widths = (480, 960, 1600)
+default_quality = 80
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor()
+    return _pool
+
+
+def resize_image(filename, width, quality):
+    """Returns the encoded bytes of `filename` scaled to `width`.  Runs
+    in a worker process.
+    """
+    from PIL import Image
+
+    with Image.open(filename) as img:
+        format = img.format
+        height = max(1, round(img.height * width / float(img.width)))
+        resized = img.resize((width, height), Image.LANCZOS)
+    options = {}
+    if format in ("JPEG", "WEBP"):
+        options = {"quality": quality, "optimize": True}
+    elif format == "PNG":
+        options = {"optimize": True}
+    rv = io.BytesIO()
+    resized.save(rv, format, **options)
+    return rv.getvalue()
+
+
+def get_image_size(filename):
+    from PIL import Image
+
+    with Image.open(filename) as img:
+        return img.size
+
+
+def hash_file(filename):
+    h = sha1()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ImageIndex(object):
+    """Remembers hash and size of every image source between builds so
+    unchanged images are neither read nor decoded again.
+    """
+
+    def __init__(self, builder):
+        self.filename = os.path.join(builder.cache.path, "images.json")
+        try:
+            with io.open(self.filename, encoding="utf-8") as f:
+                self.previous = json.load(f)
+        except (IOError, ValueError):
+            self.previous = {}
+        self.current = {}
+
+    def lookup(self, source_filename, full_filename):
+        st = os.stat(full_filename)
+        entry = self.previous.get(source_filename)
+        if (
+            entry is None
+            or entry["mtime"] != st.st_mtime_ns
+            or entry["size"] != st.st_size
+        ):
+            width, height = get_image_size(full_filename)
+            entry = {
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "hash": hash_file(full_filename),
+                "width": width,
+                "height": height,
+            }
+        self.current[source_filename] = entry
+        return entry
+
+    def save(self):
+        folder = os.path.dirname(self.filename)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with io.open(self.filename, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.current, sort_keys=True))
+
+
+class Image(object):
+    """Template information about an image and its derivatives."""
+
+    def __init__(self, src, width, height, derivatives):
+        self.src = src
+        self.width = width
+        self.height = height
+        self.derivatives = derivatives
+
+    @property
+    def srcset(self):
+        return ", ".join(
+            "%s %dw" % (url, width)
+            for url, width in self.derivatives + [(self.src, self.width)]
+        )
+
+
+class ImageProgram(CopyProgram):
+    """Copies an image and writes resized derivatives next to it."""
+
+    @property
+    def widths(self):
+        return self.context.config.get("image_widths") or default_widths
+
+    @property
+    def quality(self):
+        return self.context.config.get("image_quality") or default_quality
+
+    def get_derivative_filename(self, filename, width):
+        base, ext = os.path.splitext(filename)
+        return "%s-%dw%s" % (base, width, ext)
+
+    def register(self):
+        """Records the image for templates and the collection of the
+        cache.  Runs whenever the context is published, also for contexts
+        the daemon kept from the last build without preparing them again.
+        """
+        storage = get_image_storage(self.context.builder)
+        self.entry = storage["index"].lookup(
+            self.context.source_filename, self.context.full_source_filename
+        )
+        self.derivative_widths = sorted(
+            width for width in self.widths if width < self.entry["width"]
+        )
+        src = "/" + self.context.destination_filename.replace(os.sep, "/")
+        storage["by_url"][src] = Image(
+            src,
+            self.entry["width"],
+            self.entry["height"],
+            [
+                (self.get_derivative_filename(src, width), width)
+                for width in self.derivative_widths
+            ],
+        )
+        storage["keys"].update(key for width, key in self.iter_cache_keys())
+
+    def iter_cache_keys(self):
+        for width in self.derivative_widths:
+            yield width, make_key(
+                self.entry["hash"], str(width), str(self.quality)
+            )
+
+    def run(self):
+        CopyProgram.run(self)
+        builder = self.context.builder
+        jobs = get_image_storage(builder)["jobs"]
+        for width, key in self.iter_cache_keys():
+            filename = self.get_derivative_filename(
+                self.context.full_destination_filename, width
+            )
+            data = builder.cache.get("images", key)
+            if data is not None:
+                builder.write_output(filename, data)
+                continue
+            future = get_pool().submit(
+                resize_image,
+                self.context.full_source_filename,
+                width,
+                self.quality,
+            )
+            jobs.append((future, key, filename))
+
+
+def register_image(context):
+    program = getattr(context, "program", None)
+    if isinstance(program, ImageProgram):
+        program.register()
+
+
+def get_image_storage(builder):
+    storage = builder.get_storage("images")
+    if "index" not in storage:
+        storage["index"] = ImageIndex(builder)
+        storage["by_url"] = {}
+        storage["keys"] = set()
+        storage["jobs"] = []
+        storage["rendered"] = 0
+    return storage
+
+
+def write_derivatives(builder):
+    """Waits for the pending derivatives and writes them."""
+    storage = get_image_storage(builder)
+    jobs = storage["jobs"]
+    for future, key, filename in jobs:
+        data = future.result()
+        builder.cache.set("images", key, data)
+        builder.write_output(filename, data)
+    storage["rendered"] += len(jobs)
+    del jobs[:]
+
+
+def finish_images(builder):
+    """Collects cache entries that no image refers to anymore."""
+    storage = get_image_storage(builder)
+    index = storage["index"]
+    # partial builds don't know about all images, nothing can be collected
+    if not builder.partial_build and (
+        storage["rendered"] or index.current != index.previous
+    ):
+        builder.cache.collect("images", storage["keys"])
+        index.save()
+    storage["rendered"] = 0
+
+
+@pass_context
+def get_image(context, url):
+    storage = get_image_storage(context["builder"])
+    return storage["by_url"].get("/" + posixpath.normpath(url).lstrip("/"))
+
+
+def setup(builder):
+    builder.programs["image"] = ImageProgram
+    after_file_prepared.connect(register_image)
+    after_files_built.connect(write_derivatives)
+    before_build_finished.connect(finish_images)
+    builder.jinja_env.globals["get_image"] = get_image
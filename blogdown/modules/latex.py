@@ -17,6 +17,8 @@ from os import path, getcwd, chdir
 from subprocess import Popen, PIPE
 from markupsafe import escape
 
+from blogdown.cache import make_key
+
 from docutils import nodes, utils
 from docutils.parsers.rst import Directive, directives, roles
 
@@ -55,18 +57,34 @@ def find_depth(stdout):
             return int(m.group(1))
 
 
+def get_cache_key(context, latex):
+    font_size = context.builder.config.root_get("modules.latex.font_size", 16)
+    return make_key(latex, str(font_size))
+
+
 def render_math(context, math):
-    relname = "_math/%s.png" % sha1(math).hexdigest()
+    relname = "_math/%s.png" % sha1(math.encode("utf-8")).hexdigest()
     full_filename = context.builder.get_full_static_filename(relname)
     url = context.builder.get_static_url(relname)
+    latex = DOC_WRAPPER % wrap_displaymath(math)
+
+    # with a shared build cache the image is stored together with its
+    # depth in a "<depth>\n<png>" value.
+    cache = context.builder.cache
+    key = None
+    if cache.shared:
+        key = get_cache_key(context, latex)
+        cached = cache.get("math", key)
+        if cached is not None:
+            depth, data = cached.split(b"\n", 1)
+            context.builder.write_output(full_filename, data)
+            return url, int(depth) if depth else None
 
     # if we rebuild the document, we also want to rebuild the math
     # for it.
     if os.path.isfile(full_filename):
         os.remove(full_filename)
 
-    latex = DOC_WRAPPER % wrap_displaymath(math)
-
     depth = None
     tempdir = tempfile.mkdtemp()
     try:
@@ -126,7 +144,13 @@ def render_math(context, math):
                 "dvipng exited with error:\n[stderr]\n%s\n"
                 "[stdout]\n%s" % (stderr, stdout)
             )
-        depth = find_depth(stdout)
+        depth = find_depth(stdout.decode("utf-8", "replace"))
+        context.builder.add_written_file(full_filename)
+        if key is not None:
+            with open(full_filename, "rb") as f:
+                data = f.read()
+            depth_bytes = b"" if depth is None else str(depth).encode()
+            cache.set("math", key, depth_bytes + b"\n" + data)
     finally:
         try:
             shutil.rmtree(tempdir)
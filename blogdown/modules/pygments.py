@@ -10,12 +10,15 @@
 """
 import io
 import os
+import json
 
-from blogdown.signals import before_file_processed, before_build_finished
+from blogdown.cache import make_key
+from blogdown.signals import before_file_processed, before_build_started
 
 from docutils import nodes
 from docutils.parsers.rst import Directive, directives
 
+import pygments
 from pygments import highlight
 from pygments.lexers import get_lexer_by_name, TextLexer
 from pygments.formatters import HtmlFormatter
@@ -62,15 +65,37 @@ def get_formatter_options(options):
     }
 
 
-def format_code(options, formatter, code, language):
+def highlight_cached(cache, code, language, formatter, fmt_opt):
+    """Highlights code, cached in the shared build cache if there is
+    one.
+    """
+    key = None
+    if cache is not None and cache.shared:
+        key = make_key(
+            code,
+            language or "",
+            json.dumps(fmt_opt, sort_keys=True),
+            formatter.style.__name__,
+            pygments.__version__,
+        )
+        rv = cache.get("highlight", key)
+        if rv is not None:
+            return rv.decode("utf-8")
     try:
         lexer = get_lexer_by_name(language)
     except ValueError:
         lexer = TextLexer()
-    fmt_opt = get_formatter_options(options)
     for k, v in fmt_opt.items():
         setattr(formatter, k, v)
-    formatted = highlight(code, lexer, formatter)
+    rv = highlight(code, lexer, formatter)
+    if key is not None:
+        cache.set("highlight", key, rv.encode("utf-8"))
+    return rv
+
+
+def format_code(options, formatter, code, language, cache=None):
+    fmt_opt = get_formatter_options(options)
+    formatted = highlight_cached(cache, code, language, formatter, fmt_opt)
     literal_block = nodes.raw("", formatted, format="html")
     linenos = fmt_opt["linenos"]
     caption = options.get("caption")
@@ -102,7 +127,13 @@ class CodeBlock(Directive):
     def run(self):
         language = self.arguments[0]
         code = "\n".join(self.content)
-        return format_code(self.options, html_formatter, code, language)
+        return format_code(
+            self.options, html_formatter, code, language, self.get_cache()
+        )
+
+    def get_cache(self):
+        context = self.state.document.settings.rstblog_context
+        return context.builder.cache
 
 
 class LiteralInclude(CodeBlock):
@@ -121,6 +152,7 @@ class LiteralInclude(CodeBlock):
         context = self.state.document.settings.rstblog_context
         dirname = os.path.dirname(context.full_source_filename)
         fullpath = os.path.join(dirname, filename)
+        self.state.document.settings.record_dependencies.add(fullpath)
         with io.open(fullpath, "rt", encoding=encoding) as f:
             return list(f)
 
@@ -141,7 +173,9 @@ class LiteralInclude(CodeBlock):
         if "caption" in options and not options["caption"]:
             options["caption"] = os.path.basename(filename)
         code = "".join(lines)
-        return format_code(options, html_formatter, code, language)
+        return format_code(
+            options, html_formatter, code, language, self.get_cache()
+        )
 
 
 def inject_stylesheet(context, **kwargs):
@@ -149,7 +183,9 @@ def inject_stylesheet(context, **kwargs):
 
 
 def write_stylesheet(builder, **kwargs):
-    with builder.open_static_file("_pygments.css", "w") as f:
+    with builder.open_static_file(
+        "_pygments.css", "w", only_if_changed=True
+    ) as f:
         f.write(html_formatter.get_style_defs())
 
 
@@ -163,4 +199,4 @@ def setup(builder):
     directives.register_directive("sourcecode", CodeBlock)
     directives.register_directive("literalinclude", LiteralInclude)
     before_file_processed.connect(inject_stylesheet)
-    before_build_finished.connect(write_stylesheet)
+    before_build_started.connect(write_stylesheet)
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.modules.search
+    ~~~~~~~~~~~~~~~~~~~~~~~
+
+    A client side search index generated at build time.
+
+    Every published entry with a title is tokenized (title, tags, summary
+    and the rendered contents) and stemmed.  The resulting inverted index
+    is split into shards by the first characters of the terms, so a
+    browser only has to fetch the shard for the prefix of the query::
+
+        /search/docs.json   {"<doc id>": {"url": ..., "title": ...}, ...}
+        /search/terms/<prefix>.json
+                            {"<term>": [[<doc id>, <weight>], ...], ...}
+
+    Queries have to be lowercased and stemmed the same way; the stemmer
+    is the snowball stemmer for the configured language if the
+    ``snowballstemmer`` package is installed and a simple suffix stripper
+    otherwise.  Configuration (all optional)::
+
+        modules:
+          search:
+            prefix_length: 2
+            docs_url: /search/docs.json
+            shard_url: /search/terms/<prefix>.json
+
+    The terms of an entry are cached by the hash of its source, document
+    ids are stable between builds and only the shards whose contents
+    changed are written again.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import re
+import json
+
+from markupsafe import Markup
+
+from blogdown.cache import make_key
+from blogdown.signals import after_file_published, before_build_finished
+
+try:
+    import snowballstemmer
+except ImportError:
+    snowballstemmer = None
+
+
+_word_re = re.compile(r"\w+", re.UNICODE)
+_suffixes = (
+    "ational",
+    "ations",
+    "ation",
+    "ness",
+    "ings",
+    "ing",
+    "edly",
+    "ies",
+    "ied",
+    "ers",
+    "ly",
+    "ed",
+    "es",
+    "er",
+    "s",
+)
+
+#: weight of a term per field it appears in
+field_weights = (("title", 5), ("tags", 3), ("summary", 2), ("body", 1))
+
+
+def simple_stem(word):
+    for suffix in _suffixes:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def get_stemmer(builder):
+    """Returns the name and the function of the stemmer to use."""
+    if snowballstemmer is not None:
+        language = builder.config.root_get("modules.search.language")
+        if language is None:
+            language = builder.locale.english_name.split()[0].lower()
+        try:
+            stemmer = snowballstemmer.stemmer(language)
+        except KeyError:
+            pass
+        else:
+            return "snowball-" + language, stemmer.stemWord
+    return "simple", simple_stem
+
+
+def tokenize(text, stem):
+    return [stem(word) for word in _word_re.findall(text.lower())]
+
+
+def get_fields(context):
+    return {
+        "title": context.title or "",
+        "tags": " ".join(getattr(context, "tags", ()) or ()),
+        "summary": Markup(context.render_summary()).striptags(),
+        "body": Markup(context.render_contents()).striptags(),
+    }
+
+
+def get_terms(builder, context, stemmer):
+    """Returns ``{term: weight}`` for an entry, cached by the hash of its
+    source file and metadata.
+    """
+    stemmer_name, stem = stemmer
+    with open(context.full_source_filename, "rb") as f:
+        source = f.read()
+    key = make_key(
+        source,
+        context.title or "",
+        context.summary or "",
+        " ".join(sorted(getattr(context, "tags", ()) or ())),
+        stemmer_name,
+    )
+    cached = builder.cache.get("search", key)
+    if cached is not None:
+        return json.loads(cached.decode("utf-8"))
+    fields = get_fields(context)
+    terms = {}
+    for field, weight in field_weights:
+        for term in tokenize(fields[field], stem):
+            terms[term] = terms.get(term, 0) + weight
+    builder.cache.set("search", key, json.dumps(terms).encode("utf-8"))
+    return terms
+
+
+class SearchState(object):
+    """Document ids and shard prefixes of the last build, kept in the
+    cache folder so ids stay stable and vanished shards can be removed.
+    """
+
+    def __init__(self, builder):
+        self.filename = os.path.join(builder.cache.path, "search.json")
+        try:
+            with io.open(self.filename, encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            data = {}
+        self.ids = data.get("ids", {})
+        self.next_id = data.get("next_id", 0)
+        self.prefixes = set(data.get("prefixes", ()))
+
+    def get_id(self, slug):
+        rv = self.ids.get(slug)
+        if rv is None:
+            rv = self.ids[slug] = self.next_id
+            self.next_id += 1
+        return rv
+
+    def save(self, slugs, prefixes):
+        self.ids = dict((k, v) for k, v in self.ids.items() if k in slugs)
+        self.prefixes = set(prefixes)
+        folder = os.path.dirname(self.filename)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        with io.open(self.filename, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": self.ids,
+                    "next_id": self.next_id,
+                    "prefixes": sorted(self.prefixes),
+                },
+                f,
+            )
+
+
+def remember_entry(context):
+    if context.title is not None:
+        context.builder.get_storage("search").setdefault(
+            "entries", []
+        ).append(context)
+
+
+def write_search_index(builder):
+    storage = builder.get_storage("search")
+    prefix_length = builder.config.root_get(
+        "modules.search.prefix_length", 2
+    )
+    stemmer = get_stemmer(builder)
+    state = SearchState(builder)
+    docs = {}
+    shards = {}
+    for context in storage.get("entries", ()):
+        doc_id = state.get_id(context.slug)
+        docs[doc_id] = {
+            "url": builder.link_to("page", slug=context.slug),
+            "title": context.title,
+        }
+        for term, weight in get_terms(builder, context, stemmer).items():
+            shard = shards.setdefault(term[:prefix_length], {})
+            shard.setdefault(term, []).append([doc_id, weight])
+
+    docs_filename = builder.get_link_filename("search_docs")
+    builder.write_output(
+        docs_filename,
+        json.dumps(docs, sort_keys=True, separators=(",", ":")),
+        only_if_changed=True,
+    )
+    for prefix, shard in shards.items():
+        for postings in shard.values():
+            postings.sort(key=lambda x: (-x[1], x[0]))
+        filename = builder.get_link_filename("search_shard", prefix=prefix)
+        if filename == docs_filename:
+            raise ValueError(
+                "the search shard for %r would overwrite the documents, "
+                "modules.search.shard_url needs a folder of its own" % prefix
+            )
+        builder.write_output(
+            filename,
+            json.dumps(shard, sort_keys=True, separators=(",", ":")),
+            only_if_changed=True,
+        )
+    for prefix in state.prefixes.difference(shards):
+        builder.remove_output_file(
+            builder.get_link_filename("search_shard", prefix=prefix)
+        )
+    state.save(set(c.slug for c in storage.get("entries", ())), shards)
+
+
+def setup(builder):
+    after_file_published.connect(remember_entry)
+    before_build_finished.connect(write_search_index)
+    builder.register_url(
+        "search_docs",
+        config_key="modules.search.docs_url",
+        config_default="/search/docs.json",
+    )
+    builder.register_url(
+        "search_shard",
+        config_key="modules.search.shard_url",
+        config_default="/search/terms/<prefix>.json",
+    )
@@ -5,16 +5,27 @@
 
     Implements tagging.
 
+    Every published entry also gets the entries related to it as
+    ``ctx.related_entries``, the ones sharing the most (and the rarest)
+    tags first.  Words of the titles can be taken into account as well::
+
+        modules:
+          tags:
+            related_count: 5
+            related_title_weight: 0.5
+
     :copyright: (c) 2010 by Armin Ronacher.
     :license: BSD, see LICENSE for more details.
 """
+import re
+from heapq import nsmallest
 from math import log
-from urllib.parse import urljoin
 
 from jinja2 import pass_context
-from feedgen.feed import FeedGenerator
 
-from blogdown.signals import after_file_published, before_build_finished
+from blogdown import atom
+from blogdown.plugin import BatchHook
+from blogdown.signals import before_build_finished
 
 
 class Tag(object):
@@ -26,7 +37,12 @@ class Tag(object):
 
 @pass_context
 def get_tags(context, limit=50):
-    tags = get_tag_summary(context["builder"])
+    builder = context["builder"]
+    return builder.memoize(("tags.get_tags", limit), sort_tags, builder, limit)
+
+
+def sort_tags(builder, limit):
+    tags = get_tag_summary(builder)
     if limit:
         tags.sort(key=lambda x: -x.count)
         tags = tags[:limit]
@@ -52,51 +68,205 @@ def get_tagged_entries(builder, tag):
     return by_tag.get(tag) or []
 
 
-def remember_tags(context):
-    tags = context.config.merged_get("tags") or []
-    storage = context.builder.get_storage("tags")
-    by_file = storage.setdefault("by_file", {})
-    by_file[context.source_filename] = tags
-    by_tag = storage.setdefault("by_tag", {})
-    for tag in tags:
-        by_tag.setdefault(tag.lower(), []).append(context)
-    context.tags = frozenset(tags)
+_word_re = re.compile(r"\w{4,}", re.UNICODE)
+
+
+def get_features(tags, title, title_weight):
+    """Returns the features of an entry the related entries are found
+    by: its tags and, if they have a weight, the words of its title.
+    """
+    rv = set("tag:" + tag.lower() for tag in tags)
+    if title_weight and title:
+        rv.update("word:" + word for word in _word_re.findall(title.lower()))
+    return frozenset(rv)
+
+
+def get_timestamp(context):
+    pub_date = context.pub_date
+    return pub_date.timestamp() if pub_date is not None else 0
+
+
+class RelatedIndex(object):
+    """An inverted index from features to the entries that have them.
+    Entries score a point for every feature they share with an entry,
+    divided by the log of the number of entries with the feature, so the
+    score only depends on the postings of the entry's features.  When
+    the index is updated, only the entries that share a feature with an
+    entry that was added, changed or removed are scored again.
+    """
+
+    def __init__(self):
+        self.features = {}
+        self.postings = {}
+        self.related = {}
+        self.settings = None
+
+    def remove(self, source_filename):
+        features, timestamp = self.features.pop(
+            source_filename, (frozenset(), 0)
+        )
+        for feature in features:
+            postings = self.postings[feature]
+            postings.discard(source_filename)
+            if not postings:
+                del self.postings[feature]
+        self.related.pop(source_filename, None)
+        return features
+
+    def add(self, source_filename, value):
+        self.features[source_filename] = value
+        for feature in value[0]:
+            self.postings.setdefault(feature, set()).add(source_filename)
+
+    def update(self, items, count, title_weight):
+        """Updates the index to `items`, a dict of source file names and
+        their ``(features, timestamp)``.
+        """
+        if self.settings != (count, title_weight):
+            self.settings = (count, title_weight)
+            self.related.clear()
+        changed = set()
+        for source_filename in set(self.features).difference(items):
+            changed.update(self.remove(source_filename))
+        for source_filename, value in items.items():
+            if self.features.get(source_filename) != value:
+                changed.update(self.remove(source_filename))
+                self.add(source_filename, value)
+                changed.update(value[0])
+        if changed:
+            for source_filename in list(self.related):
+                if not self.features[source_filename][0].isdisjoint(changed):
+                    del self.related[source_filename]
+
+    def get_weight(self, feature):
+        weight = 1.0 / log(1 + len(self.postings[feature]))
+        if feature.startswith("word:"):
+            weight *= self.settings[1]
+        return weight
+
+    def score(self, source_filename):
+        scores = {}
+        for feature in self.features[source_filename][0]:
+            postings = self.postings[feature]
+            if len(postings) < 2:
+                continue
+            weight = self.get_weight(feature)
+            for other in postings:
+                scores[other] = scores.get(other, 0) + weight
+        scores.pop(source_filename, None)
+        features = self.features
+        # the best score first, the newest entry among equals
+        return nsmallest(
+            self.settings[0],
+            scores,
+            key=lambda x: (-scores[x], -features[x][1], x),
+        )
+
+    def get_related(self, source_filename):
+        """Returns the source file names of the related entries."""
+        rv = self.related.get(source_filename)
+        if rv is None:
+            rv = self.related[source_filename] = self.score(source_filename)
+        return rv
+
+
+class TagIndex(BatchHook):
+    """Collects the tags of all published entries and finds the related
+    entries of each.  The related entries index is kept between the
+    builds of a builder.
+    """
+
+    parallel_safe = True
+
+    def __init__(self):
+        self.related = RelatedIndex()
+
+    def __getstate__(self):
+        # workers only map, the index stays in the building process
+        state = self.__dict__.copy()
+        state["related"] = None
+        return state
+
+    def extract(self, context):
+        return context.source_filename, context.config.merged_get("tags")
+
+    def map(self, items):
+        by_file = {}
+        by_tag = {}
+        for source_filename, tags in items:
+            tags = tags or []
+            by_file[source_filename] = tags
+            for tag in tags:
+                by_tag.setdefault(tag.lower(), []).append(source_filename)
+        return by_file, by_tag
+
+    def merge(self, results):
+        by_file = {}
+        by_tag = {}
+        for files, tags in results:
+            by_file.update(files)
+            for tag, sources in tags.items():
+                by_tag.setdefault(tag, []).extend(sources)
+        return by_file, by_tag
+
+    def apply(self, builder, entries, result):
+        by_file, by_tag = result
+        contexts = dict((c.source_filename, c) for c in entries)
+        storage = builder.get_storage("tags")
+        storage["by_file"] = by_file
+        storage["by_tag"] = dict(
+            (tag, [contexts[source] for source in sources])
+            for tag, sources in by_tag.items()
+        )
+        for context in entries:
+            context.tags = frozenset(by_file[context.source_filename])
+
+        count = builder.config.root_get("modules.tags.related_count", 5)
+        title_weight = builder.config.root_get(
+            "modules.tags.related_title_weight", 0
+        )
+        self.related.update(
+            dict(
+                (
+                    context.source_filename,
+                    (
+                        get_features(
+                            context.tags, context.title, title_weight
+                        ),
+                        get_timestamp(context),
+                    ),
+                )
+                for context in entries
+            ),
+            count,
+            title_weight,
+        )
+        for context in entries:
+            context.related_entries = [
+                contexts[source]
+                for source in self.related.get_related(
+                    context.source_filename
+                )
+            ]
 
 
 def write_tagcloud_page(builder):
-    with builder.open_link_file("tagcloud") as f:
+    with builder.open_link_file("tagcloud", only_if_changed=True) as f:
         rv = builder.render_template("tagcloud.html")
         f.write(rv + "\n")
 
 
 def write_tag_feed(builder, tag):
-    blog_author = builder.config.root_get("author")
-    url = builder.config.root_get("canonical_url") or "http://localhost/"
-    name = builder.config.get("feed.name") or "Recent Blog Posts"
-    subtitle = builder.config.get("feed.subtitle") or "Recent blog posts"
-    feed_url = urljoin(url, builder.link_to("blog_feed"))
-    feed = FeedGenerator()
-    feed.id(feed_url)
-    feed.link(href=url)
-    feed.link(href=feed_url, rel="self")
-    feed.title(name)
-    feed.subtitle(subtitle)
-    for entry in get_tagged_entries(builder, tag)[:10]:
-        fe = feed.add_entry()
-        fe.id(urljoin(url, entry.slug))
-        fe.link(href=fe.id(), rel="self")
-        fe.title(entry.title)
-        fe.content(entry.render_contents(), type="html")
-        fe.author(name=blog_author)
-        fe.updated(entry.pub_date)
-    with builder.open_link_file("tagfeed", tag=tag.name) as f:
-        f.write(feed.atom_str().decode("utf-8") + "\n")
+    entries = get_tagged_entries(builder, tag)[:10]
+    atom.write_feed(builder, entries, "tagfeed", tag=tag.name)
 
 
 def write_tag_page(builder, tag):
     entries = get_tagged_entries(builder, tag)
     entries.sort(key=lambda x: (x.title or "").lower())
-    with builder.open_link_file("tag", tag=tag.name) as f:
+    with builder.open_link_file(
+        "tag", only_if_changed=True, tag=tag.name
+    ) as f:
         rv = builder.render_template(
             "tag.html", {"tag": tag, "entries": entries}
         )
@@ -111,7 +281,7 @@ def write_tag_files(builder):
 
 
 def setup(builder):
-    after_file_published.connect(remember_tags)
+    builder.register_batch_hook(TagIndex())
     before_build_finished.connect(write_tag_files)
     builder.register_url(
         "tag", config_key="modules.tags.tag_url", config_default="/tags/<tag>/"
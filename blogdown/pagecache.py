@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.pagecache
+    ~~~~~~~~~~~~~~~~~~
+
+    Rendered pages in the shared build cache.  A page is looked up by the
+    contents of its source, its configuration and everything published to
+    the modules (pages list other entries and tags, so adding or retitling
+    an entry changes all keys), including the hashes of the images of the
+    ``images`` module, whose sizes templates embed.  Under that key the
+    names of the templates and files the page was rendered with are
+    stored; the output itself is stored under a key that also covers
+    their contents, so workspaces with different templates don't evict
+    each other's pages.  It holds
+    every file the program wrote, so math images and resized images come
+    back with the page.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import os
+import json
+from base64 import b64decode, b64encode
+from contextlib import contextmanager
+
+from jinja2 import TemplateNotFound
+
+from blogdown.cache import make_key
+
+
+def dump(value):
+    return json.dumps(value, default=str, sort_keys=True)
+
+
+class PageCache(object):
+    def __init__(self, builder):
+        self.builder = builder
+        self.entries = []
+        self._site_digest = None
+        self._template_digests = {}
+
+    def reset(self, entries):
+        """Called with the published entries once they are known."""
+        self.entries = entries
+        self._site_digest = None
+        self._template_digests.clear()
+
+    def get_image_hashes(self):
+        storage = self.builder.storage.get("images")
+        if not storage:
+            return []
+        return sorted(
+            (source_filename, entry["hash"])
+            for source_filename, entry in storage["index"].current.items()
+        )
+
+    def get_site_digest(self):
+        if self._site_digest is None:
+            assets = self.builder.assets
+            self._site_digest = make_key(
+                dump(
+                    [
+                        (
+                            entry.source_filename,
+                            entry.slug,
+                            entry.title,
+                            entry.pub_date,
+                            entry.summary,
+                            sorted(getattr(entry, "tags", None) or ()),
+                        )
+                        for entry in self.entries
+                    ]
+                ),
+                dump(assets is not None and assets.mapping),
+                dump(self.get_image_hashes()),
+            )
+        return self._site_digest
+
+    def get_key(self, context):
+        with open(context.full_source_filename, "rb") as f:
+            source = f.read()
+        return make_key(
+            context.source_filename,
+            context.program_name,
+            context.destination_filename,
+            dump(context.config.stack),
+            self.get_site_digest(),
+            source,
+        )
+
+    def get_templates_digest(self, templates):
+        key = tuple(sorted(templates))
+        rv = self._template_digests.get(key)
+        if rv is not None:
+            return rv
+        env = self.builder.jinja_env
+        closure = set()
+        for name in key:
+            closure.update(self.builder.dependencies.get_closure(name))
+        parts = []
+        for name in sorted(closure):
+            try:
+                parts.extend((name, env.loader.get_source(env, name)[0]))
+            except TemplateNotFound:
+                parts.extend((name, ""))
+        rv = self._template_digests[key] = make_key(*parts)
+        return rv
+
+    def get_files_digest(self, filenames):
+        """Digest of the contents of files relative to the project."""
+        parts = []
+        for filename in sorted(filenames):
+            try:
+                with open(
+                    os.path.join(self.builder.project_folder, filename), "rb"
+                ) as f:
+                    parts.extend((filename, f.read()))
+            except IOError:
+                parts.extend((filename, ""))
+        return make_key(*parts)
+
+    def get_output_key(self, key, dependencies):
+        return make_key(
+            key,
+            self.get_templates_digest(dependencies["templates"]),
+            self.get_files_digest(dependencies["files"]),
+        )
+
+    def restore(self, context, key):
+        """Writes the cached files of a context and returns `True`, or
+        returns `False` if the page is not cached.
+        """
+        cache = self.builder.cache
+        value = None
+        dependencies = cache.read("page-dependencies", key)
+        if dependencies is not None:
+            dependencies = json.loads(dependencies.decode("utf-8"))
+            value = cache.read(
+                "page", self.get_output_key(key, dependencies)
+            )
+        cache.count("page", value is not None)
+        if value is None:
+            return False
+        folder = self.builder.project_folder
+        for filename, contents in sorted(json.loads(value).items()):
+            self.builder.write_output(
+                os.path.join(folder, filename), b64decode(contents)
+            )
+        context.templates.update(dependencies["templates"])
+        for filename in dependencies["files"]:
+            context.add_dependency(filename)
+        return True
+
+    @contextmanager
+    def record(self, context, key):
+        """Records the files written while the context is built and
+        stores them once it was built.
+        """
+        builder = self.builder
+        builder.captured_files = captured = {}
+        try:
+            yield
+        finally:
+            builder.captured_files = None
+        folder = builder.project_folder
+        outputs = {}
+        for filename, contents in captured.items():
+            if contents is None:
+                with open(filename, "rb") as f:
+                    contents = f.read()
+            elif not isinstance(contents, bytes):
+                contents = contents.encode("utf-8")
+            filename = os.path.relpath(filename, folder)
+            outputs[filename] = b64encode(contents).decode("ascii")
+        dependencies = {
+            "templates": sorted(context.templates),
+            "files": sorted(
+                os.path.relpath(filename, folder)
+                for filename in context.included_files
+            ),
+        }
+        builder.cache.set(
+            "page",
+            self.get_output_key(key, dependencies),
+            dump(outputs).encode("utf-8"),
+        )
+        builder.cache.set(
+            "page-dependencies", key, dump(dependencies).encode("utf-8")
+        )
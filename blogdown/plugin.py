@@ -3,7 +3,8 @@
     blogdown.plugin
     ~~~~~~~~~~~~~~~
 
-    Utilities for a simple plugin system.
+    Utilities for a simple plugin system, and the batch hooks plugins
+    can register in addition to the per file signals.
 
     :copyright: (c) 2015 by Thomas Gläßle
     :license: BSD, see LICENSE for more details.
@@ -19,6 +20,8 @@ __all__ = [
     "PathLoader",
     "PackageLoader",
     "ChainLoader",
+    "BatchHook",
+    "run_batch_hook",
 ]
 
 
@@ -87,3 +90,51 @@ class ChainLoader:
         for loader in self.loaders:
             for plugin in loader(name):
                 yield plugin
+
+
+class BatchHook(object):
+
+    """Processes all published entries of a build at once.  Instead of
+    collecting entries in the builder's storage one signal at a time, a
+    hook extracts what it needs of every entry, maps chunks of these items
+    to partial results, merges them and finally applies the result to the
+    builder.  Register instances with :meth:`Builder.register_batch_hook`.
+    """
+
+    #: `True` if :meth:`map` may run in a worker process.  It then only
+    #: gets the picklable items returned by :meth:`extract`, and the hook
+    #: itself has to be picklable (defined in an importable module).
+    parallel_safe = False
+
+    def extract(self, context):
+        """Returns the item :meth:`map` needs of an entry."""
+        return context
+
+    def map(self, items):
+        """Returns the partial result for a chunk of items."""
+        raise NotImplementedError()
+
+    def merge(self, results):
+        """Combines partial results, given in the order of the entries."""
+        raise NotImplementedError()
+
+    def apply(self, builder, entries, result):
+        """Stores the merged result.  Always runs in the build process."""
+        raise NotImplementedError()
+
+
+def run_batch_hook(hook, builder, entries, executor=None, chunks=1):
+    """Runs a batch hook over `entries`.  The items are split into
+    `chunks` and mapped on `executor` if the hook is parallel safe.
+    """
+    items = [hook.extract(entry) for entry in entries]
+    if executor is None or not hook.parallel_safe or chunks < 2:
+        results = [hook.map(items)]
+    else:
+        size = max(1, -(-len(items) // chunks))
+        batches = []
+        for start in range(0, len(items), size):
+            end = start + size
+            batches.append(items[start:end])
+        results = list(executor.map(hook.map, batches))
+    hook.apply(builder, entries, hook.merge(results))
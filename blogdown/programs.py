@@ -10,14 +10,22 @@
     :license: BSD, see LICENSE for more details.
 """
 import os
+import re
 import yaml
 import shutil
+import unicodedata
+from copy import copy
+from contextlib import contextmanager
 from datetime import datetime
 from weakref import ref
 from markupsafe import Markup
 
+from blogdown.cache import make_key
+
 
 class Program(object):
+    cacheable = False
+
     def __init__(self, context):
         self._context = ref(context)
 
@@ -50,19 +58,41 @@ class Program(object):
 class CopyProgram(Program):
     """A program that copies a file over unchanged"""
 
+    #: files with these extensions are passed through the builder's output
+    #: filters (fingerprinting, minification) instead of being copied.
+    filtered_extensions = (".css", ".html", ".htm", ".atom", ".xml")
+
     def run(self):
+        if self.context.builder.output_filters and (
+            self.context.source_filename.lower().endswith(
+                self.filtered_extensions
+            )
+        ):
+            with self.context.open_source_file() as f:
+                contents = f.read()
+            with self.context.open_destination_file() as f:
+                f.write(contents)
+            return
         self.context.make_destination_folder()
         shutil.copy(
             self.context.full_source_filename,
             self.context.full_destination_filename,
         )
+        self.context.builder.add_written_file(
+            self.context.full_destination_filename
+        )
 
     def get_desired_filename(self):
+        assets = self.context.builder.assets
+        if assets is not None:
+            return assets.get_destination(self.context.source_filename)
         return self.context.source_filename
 
 
 class TemplatedProgram(Program):
     default_template = None
+    #: the rendered page can be stored in the shared build cache
+    cacheable = True
 
     def get_template_context(self):
         return {}
@@ -104,6 +134,56 @@ def parse_header_lines(lines):
     return yaml.unsafe_load("\n".join(lines))
 
 
+class DependencyRecorder(object):
+    """Stands in for docutils' dependency list and registers the files
+    that directives read with the context.
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+    def add(self, *filenames):
+        for filename in filenames:
+            self.context.add_dependency(os.path.abspath(filename))
+
+    def close(self):
+        pass
+
+
+#: idle docutils publishers by their settings
+_rst_publishers = {}
+
+
+@contextmanager
+def rst_publisher(settings):
+    """Provides a docutils publisher that renders HTML fragments with the
+    given settings overrides.  Setting up the option parser and the
+    components is more expensive than rendering a short document, so the
+    publishers are reused.  Each of them only renders one document at a
+    time and gets a fresh copy of its settings for it.
+    """
+    key = (tuple(sorted(settings.items())), os.getcwd())
+    idle = _rst_publishers.setdefault(key, [])
+    try:
+        publisher, defaults = idle.pop()
+    except IndexError:
+        from docutils.core import Publisher
+        from docutils.io import StringInput, StringOutput
+
+        publisher = Publisher(
+            source_class=StringInput, destination_class=StringOutput
+        )
+        publisher.set_components("standalone", "restructuredtext", "html4css1")
+        # reads docutils.conf files from the current folder, hence the key
+        defaults = publisher.get_settings(traceback=True, **settings)
+    publisher.settings = copy(defaults)
+    try:
+        yield publisher
+    finally:
+        publisher.settings = publisher.document = None
+        idle.append((publisher, defaults))
+
+
 class RSTProgram(TemplatedProgram):
     """A program that renders an rst file into a template"""
 
@@ -154,7 +234,19 @@ class RSTProgram(TemplatedProgram):
             if not line:
                 break
             buffer.append(line)
-        return self.render_rst("\n".join(buffer)).get("title")
+        text = "\n".join(buffer)
+        cache = self.context.builder.cache
+        if not cache.shared:
+            return self.render_rst(text).get("title")
+        key = make_key(
+            text, str(self.context.config.get("rst_header_level", 2))
+        )
+        rv = cache.get("title", key)
+        if rv is not None:
+            return rv.decode("utf-8")
+        rv = self.render_rst(text).get("title")
+        cache.set("title", key, rv.encode("utf-8"))
+        return rv
 
     def get_fragments(self):
         if self._fragment_cache is not None:
@@ -167,19 +259,20 @@ class RSTProgram(TemplatedProgram):
         return rv
 
     def render_rst(self, contents):
-        from docutils.core import publish_parts
-
         settings = {
             "initial_header_level": self.context.config.get(
                 "rst_header_level", 2
             ),
-            "rstblog_context": self.context,
         }
-        parts = publish_parts(
-            source=contents,
-            writer_name="html4css1",
-            settings_overrides=settings,
-        )
+        with rst_publisher(settings) as publisher:
+            publisher.settings.rstblog_context = self.context
+            publisher.settings.record_dependencies = DependencyRecorder(
+                self.context
+            )
+            publisher.set_source(contents)
+            publisher.set_destination()
+            publisher.publish()
+            parts = publisher.writer.parts
         return {
             "title": Markup(parts["title"]).striptags(),
             "html_title": Markup(parts["html_title"]),
@@ -200,53 +293,254 @@ class RSTProgram(TemplatedProgram):
         return ctx
 
 
-class MDProgram(TemplatedProgram):
-    """A program that renders an rst file into a template"""
+_meta_begin_re = re.compile(r"^-{3}(\s.*)?$")
+_meta_end_re = re.compile(r"^(-{3}|\.{3})(\s.*)?$")
+_meta_re = re.compile(r"^[ ]{0,3}(?P<key>[A-Za-z0-9_-]+):\s*(?P<value>.*)")
+_meta_more_re = re.compile(r"^[ ]{4,}(?P<value>.*)")
+_id_count_re = re.compile(r"^(.*)_([0-9]+)$")
 
-    default_template = "md_display.html"
 
-    def __init__(self, context):
+def split_meta(text):
+    """Splits the metadata header off a Markdown document.  Returns
+    ``(meta, body)`` where `meta` maps the lowercased keys to lists of
+    lines, like the meta extension of Python-Markdown does.
+    """
+    lines = text.split("\n")
+    meta = {}
+    key = None
+    if lines and _meta_begin_re.match(lines[0]):
+        lines.pop(0)
+    while lines:
+        line = lines.pop(0)
+        if not line.strip() or _meta_end_re.match(line):
+            break
+        match = _meta_re.match(line)
+        if match is not None:
+            key = match.group("key").lower().strip()
+            meta.setdefault(key, []).append(match.group("value").strip())
+            continue
+        match = _meta_more_re.match(line)
+        if match is not None and key is not None:
+            meta[key].append(match.group("value").strip())
+            continue
+        lines.insert(0, line)
+        break
+    return meta, "\n".join(lines)
+
+
+def slugify(value):
+    """The header ids of Python-Markdown's toc extension."""
+    value = unicodedata.normalize("NFKD", value)
+    value = value.encode("ascii", "ignore").decode("ascii")
+    value = re.sub(r"[^\w\s-]", "", value).strip().lower()
+    return re.sub(r"[-\s]+", "-", value)
+
+
+def unique_id(id, ids):
+    while id in ids or not id:
+        match = _id_count_re.match(id)
+        if match is not None:
+            id = "%s_%d" % (match.group(1), int(match.group(2)) + 1)
+        else:
+            id = "%s_%d" % (id, 1)
+    ids.add(id)
+    return id
+
+
+def highlight_code(code, language=None):
+    """Highlights a code block the way Python-Markdown's codehilite
+    extension does, guessing the language if it's unknown.
+    """
+    from pygments import highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name, guess_lexer
+    from pygments.util import ClassNotFound
+
+    try:
+        lexer = get_lexer_by_name(language or "")
+    except ClassNotFound:
+        try:
+            lexer = guess_lexer(code)
+        except ClassNotFound:
+            lexer = get_lexer_by_name("text")
+    formatter = HtmlFormatter(cssclass="syntax", wrapcode=True)
+    return highlight(code, lexer, formatter)
+
+
+class MarkdownBackend(object):
+    """Converts Markdown to HTML.  One instance is shared by all files of
+    a build that use it.  The metadata header is already removed from the
+    text that is passed to :meth:`convert`.
+    """
+
+    def convert(self, text):
+        raise NotImplementedError()
+
+
+class PythonMarkdownBackend(MarkdownBackend):
+    """Python-Markdown with the extensions blogdown always used."""
+
+    def __init__(self):
         from markdown import Markdown
 
         self.md = Markdown(
             output_format="html5",
-            safe_mode="escape",
-            enable_attributes=True,
             extensions=[
-                "smart_strong",
                 "fenced_code",
                 "footnotes",
                 "attr_list",
                 "def_list",
                 "tables",
                 "abbr",
-                "meta",
-                "headerid",
-                "codehilite(pygments_style=tango,"
-                + "css_class=syntax,guess_lang=True)",
+                "toc",
+                "codehilite",
             ],
+            extension_configs={
+                "codehilite": {
+                    "pygments_style": "tango",
+                    "css_class": "syntax",
+                    "guess_lang": True,
+                },
+            },
+        )
+
+    def convert(self, text):
+        self.md.reset()
+        return self.md.convert(text)
+
+
+class MarkdownItBackend(MarkdownBackend):
+    """CommonMark with markdown-it-py.  Header ids, highlighted code
+    blocks and footnotes are rendered like with Python-Markdown.  Requires
+    the ``markdown-it-py`` and ``mdit-py-plugins`` packages.
+    """
+
+    def __init__(self):
+        from markdown_it import MarkdownIt
+        from mdit_py_plugins.deflist import deflist_plugin
+        from mdit_py_plugins.footnote import footnote_plugin
+
+        self.md = (
+            MarkdownIt("commonmark", {"xhtmlOut": False})
+            .enable("table")
+            .use(footnote_plugin)
+            .use(deflist_plugin)
+        )
+        self.md.core.ruler.push("header_ids", self.add_header_ids)
+        self.md.add_render_rule("fence", self.render_fence)
+        self.md.add_render_rule("code_block", self.render_code_block)
+        for name in (
+            "footnote_ref",
+            "footnote_block_open",
+            "footnote_block_close",
+            "footnote_open",
+            "footnote_close",
+            "footnote_anchor",
+        ):
+            self.md.add_render_rule(name, getattr(self, "render_" + name))
+
+    def convert(self, text):
+        return self.md.render(text)
+
+    @staticmethod
+    def add_header_ids(state):
+        ids = set()
+        for idx, token in enumerate(state.tokens):
+            if token.type == "heading_open":
+                text = "".join(
+                    child.content
+                    for child in state.tokens[idx + 1].children or ()
+                    if child.type in ("text", "code_inline")
+                )
+                token.attrSet("id", unique_id(slugify(text), ids))
+
+    @staticmethod
+    def get_footnote_label(token, env):
+        note_id = token.meta["id"]
+        return env["footnotes"]["list"][note_id].get("label", note_id + 1)
+
+    @staticmethod
+    def render_fence(renderer, tokens, idx, options, env):
+        token = tokens[idx]
+        info = token.info.strip().split()
+        return highlight_code(token.content, info and info[0] or None)
+
+    @staticmethod
+    def render_code_block(renderer, tokens, idx, options, env):
+        return highlight_code(tokens[idx].content)
+
+    @staticmethod
+    def render_footnote_ref(renderer, tokens, idx, options, env):
+        label = MarkdownItBackend.get_footnote_label(tokens[idx], env)
+        return (
+            '<sup id="fnref:%s"><a class="footnote-ref" href="#fn:%s">'
+            "%d</a></sup>" % (label, label, tokens[idx].meta["id"] + 1)
         )
 
+    @staticmethod
+    def render_footnote_block_open(renderer, tokens, idx, options, env):
+        return '<div class="footnote">\n<hr>\n<ol>\n'
+
+    @staticmethod
+    def render_footnote_block_close(renderer, tokens, idx, options, env):
+        return "</ol>\n</div>\n"
+
+    @staticmethod
+    def render_footnote_open(renderer, tokens, idx, options, env):
+        label = MarkdownItBackend.get_footnote_label(tokens[idx], env)
+        return '<li id="fn:%s">\n' % label
+
+    @staticmethod
+    def render_footnote_close(renderer, tokens, idx, options, env):
+        return "</li>\n"
+
+    @staticmethod
+    def render_footnote_anchor(renderer, tokens, idx, options, env):
+        label = MarkdownItBackend.get_footnote_label(tokens[idx], env)
+        return (
+            '&#160;<a class="footnote-backref" href="#fnref:%s" title="Jump '
+            'back to footnote %d in the text">&#8617;</a>'
+            % (label, tokens[idx].meta["id"] + 1)
+        )
+
+
+class MDProgram(TemplatedProgram):
+    """A program that renders a Markdown file into a template"""
+
+    default_template = "md_display.html"
+    backend = PythonMarkdownBackend
+
+    def __init__(self, context):
         self.contents = {}
 
         TemplatedProgram.__init__(self, context)
 
+    @property
+    def engine(self):
+        # the engines live as long as the builder, unlike its memos which
+        # are dropped whenever a build starts.
+        engines = self.context.builder.markdown_engines
+        rv = engines.get(self.backend)
+        if rv is None:
+            rv = engines[self.backend] = self.backend()
+        return rv
+
     def prepare(self):
         with self.context.open_source_file() as f:
-            parsed = self.md.convert(f.read())
+            meta, body = split_meta(f.read())
+        parsed = self.engine.convert(body)
 
-        self.context.config = self.context.config.add_from_dict(self.md.Meta)
+        self.context.config = self.context.config.add_from_dict(meta)
         self.contents["fragment"] = parsed
         self.contents["html_title"] = self.contents[
             "title"
-        ] = self.context.title = " ".join(self.md.Meta.get("title", ""))
+        ] = self.context.title = " ".join(meta.get("title", ""))
         self.contents["summary"] = self.context.summary = " ".join(
-            self.md.Meta.get("summary", "")
+            meta.get("summary", "")
         )
 
     def render(self, contents):
-        self.md.reset()
-        return self.md.convert(contents)
+        return self.engine.convert(contents)
 
     def render_contents(self):
         return self.contents["fragment"]
@@ -255,3 +549,9 @@ class MDProgram(TemplatedProgram):
         ctx = TemplatedProgram.get_template_context(self)
         ctx["md"] = self.contents
         return ctx
+
+
+class CommonMarkProgram(MDProgram):
+    """Renders Markdown with markdown-it-py instead of Python-Markdown"""
+
+    backend = MarkdownItBackend
@@ -16,6 +16,8 @@ import urllib.parse
 
 from http.server import HTTPServer, SimpleHTTPRequestHandler
 
+from blogdown.compress import get_precompressed
+
 
 class SimpleRequestHandler(SimpleHTTPRequestHandler):
     def do_GET(self):
@@ -24,6 +26,27 @@ class SimpleRequestHandler(SimpleHTTPRequestHandler):
             self.server.builder.run()
         SimpleHTTPRequestHandler.do_GET(self)
 
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return SimpleHTTPRequestHandler.send_head(self)
+            path = os.path.join(path, "index.html")
+        rv = get_precompressed(path, self.headers.get("Accept-Encoding"))
+        if rv is None:
+            return SimpleHTTPRequestHandler.send_head(self)
+        encoding, filename = rv
+        f = open(filename, "rb")
+        fs = os.fstat(f.fileno())
+        self.send_response(200)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(fs.st_size))
+        self.send_header("Last-Modified", self.date_time_string(fs.st_mtime))
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        return f
+
     def translate_path(self, path):
         path = path.split("?", 1)[0].split("#", 1)[0]
         path = posixpath.normpath(urllib.parse.unquote(path))
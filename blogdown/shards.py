@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.shards
+    ~~~~~~~~~~~~~~~
+
+    Sharded builds.  ``blogdown build --shard i/N`` builds the files of
+    shard `i` of `N`; which shard a file belongs to only depends on its
+    name, so every node agrees on the split.  Each shard stores a partial
+    build in the cache folder: the metadata and dependencies of its files
+    and the output files it wrote.  Once all shards are done,
+    ``blogdown merge`` lets the modules write the blog and tag pages,
+    feeds and the other aggregates once, from the metadata of all files.
+
+    On a single machine the shards can run as parallel processes in the
+    same project folder.  Across machines, the output folder and the
+    ``shards`` folder in the cache folder of every node have to be copied
+    to the node that merges.  The tag and blog storage is not stored; the
+    merge publishes the stored metadata to the modules, which rebuilds
+    it.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import json
+from hashlib import sha1
+
+
+def parse_shard(value):
+    """Parses ``i/N`` into ``(i, N)``."""
+    try:
+        index, count = [int(x) for x in value.split("/")]
+    except ValueError:
+        raise ValueError("shards are given as i/N, not %r" % value)
+    if not 1 <= index <= count:
+        raise ValueError("there is no shard %d of %d" % (index, count))
+    return index, count
+
+
+def get_shard(source_filename, count):
+    """Returns the shard (counting from 1) of a source file."""
+    digest = sha1(source_filename.replace(os.path.sep, "/").encode("utf-8"))
+    return int(digest.hexdigest()[:8], 16) % count + 1
+
+
+def get_partial_folder(builder):
+    return os.path.join(builder.cache.path, "shards")
+
+
+def get_partial_filename(builder, index, count):
+    return os.path.join(
+        get_partial_folder(builder), "%d-of-%d.json" % (index, count)
+    )
+
+
+def save_partial(builder, index, count, contexts):
+    """Stores the partial build of a shard."""
+    folder = builder.default_output_folder
+    partial = {
+        "shard": index,
+        "count": count,
+        "metadata": dict(
+            (context.source_filename, context.get_metadata())
+            for context in contexts
+        ),
+        "dependencies": dict(
+            (
+                context.source_filename,
+                builder.dependencies.get_record(context.source_filename),
+            )
+            for context in contexts
+        ),
+        "outputs": sorted(
+            os.path.relpath(filename, folder)
+            for filename in builder.written_files
+        ),
+    }
+    filename = get_partial_filename(builder, index, count)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    tmp = filename + ".tmp"
+    with io.open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(partial, default=str, sort_keys=True))
+    os.replace(tmp, filename)
+
+
+def load_partials(builder):
+    """Returns the partial builds of all shards.  Fails if a shard is
+    missing, or if output files a shard wrote are not in the output
+    folder.
+    """
+    folder = get_partial_folder(builder)
+    try:
+        names = sorted(n for n in os.listdir(folder) if n.endswith(".json"))
+    except OSError:
+        names = []
+    partials = []
+    for name in names:
+        with io.open(os.path.join(folder, name), encoding="utf-8") as f:
+            partials.append(json.load(f))
+    if not partials:
+        raise ValueError("there are no shards to merge")
+    counts = set(partial["count"] for partial in partials)
+    if len(counts) != 1:
+        raise ValueError(
+            "shards of builds with %s shards can't be merged"
+            % " and ".join(str(count) for count in sorted(counts))
+        )
+    count = counts.pop()
+    missing = set(range(1, count + 1)).difference(
+        partial["shard"] for partial in partials
+    )
+    if missing:
+        raise ValueError(
+            "shards %s of %d are missing"
+            % (", ".join(str(index) for index in sorted(missing)), count)
+        )
+    output_folder = builder.default_output_folder
+    for partial in partials:
+        for filename in partial["outputs"]:
+            if not os.path.isfile(os.path.join(output_folder, filename)):
+                raise ValueError(
+                    "%s written by shard %d is not in the output folder"
+                    % (filename, partial["shard"])
+                )
+    return partials
+
+
+def remove_partials(builder):
+    folder = get_partial_folder(builder)
+    for name in os.listdir(folder):
+        if name.endswith(".json"):
+            os.remove(os.path.join(folder, name))
@@ -14,6 +14,10 @@ from blinker import Namespace
 
 signals = Namespace()
 
+#: fired at the start of a build before any file is processed.  This is
+#: the place to write static files that the pages link to.
+before_build_started = signals.signal("before_build_started")
+
 #: before the file is processed.  The context is already prepared and if
 #: the given program was able to extract configuration from the file, it
 #: will already be stored on the context.
@@ -25,10 +29,20 @@ after_file_prepared = signals.signal("after_file_prepared")
 #: after the file was published (public: yes)
 after_file_published = signals.signal("after_file_published")
 
+#: fired once per build with all published contexts (``entries``) after
+#: every file was prepared and before the first one is built.  The batch
+#: hooks of :mod:`blogdown.plugin` run right after it.
+entries_published = signals.signal("entries_published")
+
 #: fired the moment before a template is rendered with the context object
 #: that is about to be passed to the template.
 before_template_rendered = signals.signal("before_template_rendered")
 
+#: fired after the files of a build were built, in the builds of shards
+#: as well.  Work the programs left in the background has to be done
+#: when it returns.
+after_files_built = signals.signal("after_files_built")
+
 #: fired right before the build finished.  This is the perfect place to
 #: write some more files to the build folder.
 before_build_finished = signals.signal("before_build_finished")
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.snapshot
+    ~~~~~~~~~~~~~~~~~
+
+    Stat snapshots of a project.  A snapshot records size, modification
+    time and inode of every source, configuration and template file, and
+    of the files the sources included in the last build.
+    Comparing the snapshot stored by the last build with the current tree
+    tells what changed without creating a single program, which is what
+    ``blogdown status`` does.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import json
+
+
+def stat_key(st):
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+def stat_file(filename):
+    try:
+        return stat_key(os.stat(filename))
+    except OSError:
+        return None
+
+
+def stat_tree(folder):
+    rv = {}
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for filename in filenames:
+            filename = os.path.join(dirpath, filename)
+            key = stat_file(filename)
+            if key is not None:
+                rv[os.path.relpath(filename, folder)] = key
+    return rv
+
+
+def stat_dependencies(builder):
+    """Stats the files recorded as dependencies of the sources."""
+    rv = {}
+    for filename in builder.dependencies.iter_files():
+        key = stat_file(filename)
+        if key is not None:
+            rv[os.path.relpath(filename, builder.project_folder)] = key
+    return rv
+
+
+def new_snapshot(builder):
+    """Returns a snapshot without sources and configuration files, which
+    :meth:`~blogdown.builder.Builder.walk` adds to it from the stat
+    results it already has, so taking a snapshot while building doesn't
+    walk the tree twice.
+    """
+    return {
+        "sources": {},
+        "config": {},
+        "templates": stat_tree(builder.template_path),
+        "files": stat_dependencies(builder),
+    }
+
+
+def add_folder(snapshot, cutoff, config_entry, entries):
+    """Adds the files of a folder to a snapshot."""
+    if config_entry is not None:
+        snapshot["config"][config_entry.path[cutoff:]] = stat_key(
+            config_entry.stat()
+        )
+    sources = snapshot["sources"]
+    for entry in entries:
+        sources[entry.path[cutoff:]] = stat_key(entry.stat())
+
+
+def take_snapshot(builder):
+    """Returns the snapshot of the project of `builder`."""
+    snapshot = new_snapshot(builder)
+    for item in builder.walk(snapshot):
+        pass
+    return snapshot
+
+
+def load_snapshot(filename):
+    try:
+        with io.open(filename, encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def save_snapshot(filename, snapshot):
+    folder = os.path.dirname(filename)
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    with io.open(filename, "w", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot, sort_keys=True))
+
+
+def diff(old, new):
+    """Returns the added, changed and removed keys of two dicts."""
+    added = sorted(set(new).difference(old))
+    removed = sorted(set(old).difference(new))
+    changed = sorted(
+        key for key, value in new.items() if key in old and old[key] != value
+    )
+    return added, changed, removed
+
+
+class Status(object):
+    """The difference between two snapshots.  `added`, `changed` and
+    `removed` are sorted lists of source file names, `config` and
+    `templates` the names of the configuration and template files that
+    were added, changed or removed, and `files` the names of the included
+    files that changed.
+    """
+
+    def __init__(self, old, new):
+        if old is None:
+            old = {}
+        self.added, self.changed, self.removed = diff(
+            old.get("sources", {}), new["sources"]
+        )
+        self.config = sorted(
+            set().union(*diff(old.get("config", {}), new["config"]))
+        )
+        self.templates = sorted(
+            set().union(*diff(old.get("templates", {}), new["templates"]))
+        )
+        self.files = sorted(
+            set().union(*diff(old.get("files", {}), new["files"]))
+        )
+
+    @property
+    def clean(self):
+        """`True` if nothing changed since the last build."""
+        return not (
+            self.added
+            or self.changed
+            or self.removed
+            or self.config
+            or self.templates
+            or self.files
+        )
+
+    def iter_lines(self):
+        for key, filenames in (
+            ("A", self.added),
+            ("M", self.changed),
+            ("D", self.removed),
+        ):
+            for filename in filenames:
+                yield "%s %s" % (key, filename)
+        for filename in self.config:
+            yield "C %s" % filename
+        for filename in self.templates:
+            yield "T %s" % filename
+        for filename in self.files:
+            yield "I %s" % filename
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.urls
+    ~~~~~~~~~~~~~
+
+    Fast URL building on top of the werkzeug URL map.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import re
+from collections import OrderedDict
+from urllib.parse import quote
+
+
+rule_part_re = re.compile(r"<(?:[^>:]+:)?(\w+)>")
+
+
+class CompiledRule(object):
+    """A werkzeug rule turned into a plain list of string parts so that a
+    URL can be built by joining them.
+    """
+
+    def __init__(self, rule):
+        self.arguments = frozenset(rule.arguments)
+        self.defaults = rule.defaults or {}
+        self.parts = []
+        pos = 0
+        for match in rule_part_re.finditer(rule.rule):
+            static = rule.rule[pos:match.start()]
+            self._add_static(quote(static, "/:|+"))
+            name = match.group(1)
+            converter = rule._converters[name]
+            if name in self.defaults:
+                self._add_static(converter.to_url(self.defaults[name]))
+            else:
+                self.parts.append((name, converter))
+            pos = match.end()
+        self._add_static(quote(rule.rule[pos:], "/:|+"))
+
+    def _add_static(self, value):
+        if self.parts and self.parts[-1][1] is None:
+            value = self.parts.pop()[0] + value
+        self.parts.append((value, None))
+
+    def suitable_for(self, values):
+        for key in self.arguments:
+            if key not in self.defaults and key not in values:
+                return False
+        for key, value in self.defaults.items():
+            if key in values and value != values[key]:
+                return False
+        return True
+
+    def build(self, values):
+        return "".join(
+            value if converter is None else converter.to_url(values[value])
+            for value, converter in self.parts
+        )
+
+
+class URLBuilder(object):
+    """Builds URLs for a bound werkzeug map.  The rules are compiled once
+    all of them were registered and built URLs are kept in a least
+    recently used cache keyed by endpoint and values.  Anything the
+    compiled rules cannot express (unknown values that would end up in
+    the query string for instance) is passed on to the map adapter.
+    """
+
+    def __init__(self, adapter, maxsize=4096):
+        self.adapter = adapter
+        self.maxsize = maxsize
+        self.rules = None
+        self.cache = OrderedDict()
+
+    def compile(self):
+        """Compiles all rules of the map.  Called again automatically
+        after new rules were added.
+        """
+        url_map = self.adapter.map
+        url_map.update()
+        self.rules = {}
+        for endpoint in set(rule.endpoint for rule in url_map.iter_rules()):
+            self.rules[endpoint] = [
+                CompiledRule(rule) for rule in url_map.iter_rules(endpoint)
+            ]
+        self.prefix = self.adapter.script_name.rstrip("/")
+        self.cache.clear()
+
+    def invalidate(self):
+        self.rules = None
+        self.cache.clear()
+
+    def lookup(self, endpoint, values):
+        """Returns the cache entry for the given endpoint and values.  The
+        entry is a list with the URL as first item, the second item is
+        free for the caller to store derived information such as the
+        output filename.
+        """
+        values = {k: v for k, v in values.items() if v is not None}
+        try:
+            key = (endpoint, frozenset(values.items()))
+            entry = self.cache.get(key)
+        except TypeError:
+            return [self._build(endpoint, values), None]
+        if entry is not None:
+            self.cache.move_to_end(key)
+            return entry
+        entry = self.cache[key] = [self._build(endpoint, values), None]
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return entry
+
+    def build(self, endpoint, values):
+        return self.lookup(endpoint, values)[0]
+
+    def _build(self, endpoint, values):
+        if self.rules is None:
+            self.compile()
+        for rule in self.rules.get(endpoint, ()):
+            if not rule.suitable_for(values):
+                continue
+            if not rule.arguments.union(rule.defaults).issuperset(values):
+                break
+            return self.prefix + "/" + rule.build(values).lstrip("/")
+        return self.adapter.build(endpoint, values)
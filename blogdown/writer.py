@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+    blogdown.writer
+    ~~~~~~~~~~~~~~~
+
+    Output files.  Everything a build writes is buffered in memory and
+    handed to the builder when the file is closed, which allows the
+    builder to post-process the contents before they hit the disk.  The
+    builder can hand the actual writes to a :class:`WriterPool` so that
+    rendering continues while they drain.
+
+    :copyright: (c) 2026 by the Blogdown Team.
+    :license: BSD, see LICENSE for more details.
+"""
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class OutputFile(io.StringIO):
+    """A text buffer that calls `callback` with the written contents once
+    it's closed.  If the ``with`` block is left with an exception nothing
+    is written.
+    """
+
+    def __init__(self, callback):
+        io.StringIO.__init__(self)
+        self.callback = callback
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is not None:
+            self.callback = None
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        contents = self.getvalue()
+        io.StringIO.close(self)
+        if self.callback is not None:
+            self.callback(contents)
+
+
+def write_file(filename, contents, fsync=False):
+    """Writes bytes as they are and text encoded as UTF-8."""
+    if isinstance(contents, bytes):
+        f = open(filename, "wb")
+    else:
+        f = io.open(filename, "w", encoding="utf-8")
+    with f:
+        f.write(contents)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class WriterPool(object):
+    """Writes files on a few background threads.  At most `queue_size`
+    writes are pending, :meth:`write` blocks when the queue is full.  The
+    folder of a file is created with `make_folder` before it's written.
+
+    Errors of the writes are raised by the next call to :meth:`write` or
+    :meth:`wait`.
+    """
+
+    def __init__(self, make_folder, workers=4, queue_size=64, fsync=False):
+        self.make_folder = make_folder
+        self.fsync = fsync
+        self.executor = ThreadPoolExecutor(
+            workers, thread_name_prefix="blogdown-writer"
+        )
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.pending = []
+        self.error = None
+
+    def write(self, filename, contents):
+        self.raise_error()
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(self._write, filename, contents)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.pending = [f for f in self.pending if not f.done()]
+        self.pending.append(future)
+
+    def _write(self, filename, contents):
+        try:
+            self.make_folder(filename)
+            write_file(filename, contents, self.fsync)
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+        finally:
+            self.slots.release()
+
+    def wait(self, raise_errors=True):
+        """Blocks until all pending writes are done."""
+        pending, self.pending = self.pending, []
+        wait(pending)
+        if raise_errors:
+            self.raise_error()
+        else:
+            self.error = None
+
+    def raise_error(self):
+        error, self.error = self.error, None
+        if error is not None:
+            raise error
@@ -23,9 +23,13 @@ setup(
         "Werkzeug",
         "docutils",
         "pygments",
-        "feedgen",
         "MarkupSafe",
+        "pytz",
     ],
+    extras_require={
+        "feedgen": ["feedgen"],
+        "commonmark": ["markdown-it-py", "mdit-py-plugins"],
+    },
     classifiers=[
         "Intended Audience :: Developers",
         "Programming Language :: Python :: 3.9",
@@ -1,8 +1,53 @@
+import gzip
+import http.client
+import io
+import json
 import os
+import posixpath
+import re
 import shutil
 import subprocess
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
 from tempfile import TemporaryDirectory
+from unittest import mock
+from xml.etree import ElementTree
+
+from werkzeug.routing import Map, Rule
+
+from blogdown import atom, daemon
+from blogdown.cli import get_builder
+from blogdown.modules.tags import RelatedIndex, get_features
+from blogdown.plugin import BatchHook, run_batch_hook
+from blogdown.programs import (
+    MarkdownItBackend,
+    PythonMarkdownBackend,
+    RSTProgram,
+    rst_publisher,
+    split_meta,
+)
+from blogdown.server import Server
+from blogdown.urls import URLBuilder
+from blogdown.writer import WriterPool, write_file
+
+try:
+    import feedgen
+except ImportError:
+    feedgen = None
+
+try:
+    import markdown_it
+except ImportError:
+    markdown_it = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
 
 class TestExample(unittest.TestCase):
@@ -67,6 +112,1083 @@ class TestExample(unittest.TestCase):
             ])
 
 
+class TestMarkdownBackends(unittest.TestCase):
+
+    source = """\
+title: Backends
+tags: one
+      two
+
+# A header
+
+Some *text*, **bold** and `code`[^note].
+
+## A header
+
+```python
+print('hello')
+```
+
+    indented code
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+- one
+- two
+
+Term
+:   Definition
+
+[^note]: A footnote.
+"""
+
+    @unittest.skipIf(markdown_it is None, 'markdown-it-py is not installed')
+    def test_conformance(self):
+        meta, body = split_meta(self.source)
+        self.assertEqual(meta, {'title': ['Backends'], 'tags': ['one', 'two']})
+
+        def normalize(html):
+            return re.sub(r'>\s+<', '><', html).strip()
+
+        self.assertEqual(
+            normalize(PythonMarkdownBackend().convert(body)),
+            normalize(MarkdownItBackend().convert(body)))
+
+
+class TestURLBuilder(unittest.TestCase):
+
+    rules = [
+        ('page', '/<path:slug>', None),
+        ('blog_index', '/', {'page': 1}),
+        ('blog_index', '/page/<int:page>/', None),
+        ('blog_archive', '/archive/', None),
+        ('blog_archive', '/<int:year>/', None),
+        ('blog_archive', '/<int:year>/<int(fixed_digits=2):month>/', None),
+        ('tag', '/tags/<tag>/', None),
+        ('feed', '/feed.atom', None),
+        ('search', '/search/<any(docs, terms):kind>/<prefix>.json', None),
+    ]
+
+    values = [
+        ('page', {'slug': '2022/02/02/dlc'}),
+        ('page', {'slug': 'über uns/a b'}),
+        ('page', {'slug': 'about', 'q': 'x y', 'lang': None}),
+        ('blog_index', {}),
+        ('blog_index', {'page': 1}),
+        ('blog_index', {'page': 3}),
+        ('blog_index', {'page': 3, 'sort': 'new'}),
+        ('blog_archive', {}),
+        ('blog_archive', {'year': 2022}),
+        ('blog_archive', {'year': 2022, 'month': 2}),
+        ('blog_archive', {'year': 2022, 'month': 2, 'day': 1}),
+        ('tag', {'tag': 'c++'}),
+        ('tag', {'tag': 'a/b & c?'}),
+        ('feed', {}),
+        ('feed', {'tag': 'x', 'page': 2}),
+        ('search', {'kind': 'terms', 'prefix': 'do'}),
+    ]
+
+    def get_adapter(self, script_name):
+        url_map = Map()
+        for endpoint, rule, defaults in self.rules:
+            url_map.add(Rule(rule, endpoint=endpoint, defaults=defaults))
+        return url_map.bind('dummy.invalid', script_name=script_name)
+
+    def test_parity(self):
+        for script_name in ('/', '/blog', '/blog/', '/a b/'):
+            adapter = self.get_adapter(script_name)
+            builder = URLBuilder(adapter)
+            for endpoint, values in self.values:
+                self.assertEqual(
+                    builder.build(endpoint, dict(values)),
+                    adapter.build(endpoint, dict(values)),
+                    (script_name, endpoint, values))
+                # and once more from the cache
+                self.assertEqual(
+                    builder.build(endpoint, dict(values)),
+                    adapter.build(endpoint, dict(values)))
+
+
+class ExampleTestCase(unittest.TestCase):
+    """Runs blogdown in a copy of the example blog."""
+
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self.folder = self._temp_dir.name
+        shutil.copytree(
+            'example/blog', self.folder,
+            dirs_exist_ok=True,
+            ignore=ignore_diritem('example/blog', '_build'))
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.folder, *parts)
+
+    def edit(self, filename, old, new):
+        with open(self.path(filename)) as f:
+            contents = f.read()
+        self.assertIn(old, contents)
+        with open(self.path(filename), 'w') as f:
+            f.write(contents.replace(old, new))
+
+    def add_image(self):
+        self.edit(
+            'config.yml', 'latex]',
+            'latex, images]\nprograms:\n  "*.png": image\n'
+            'image_widths: [8]')
+        Image.new('RGB', (32, 16)).save(self.path('static', 'photo.png'))
+
+    def get_builder(self):
+        return get_builder(self.folder)
+
+    def run_builder(self, builder, *args):
+        # includes are relative to the working directory like for the cli
+        cwd = os.getcwd()
+        os.chdir(self.folder)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                builder.run(*args)
+        finally:
+            os.chdir(cwd)
+        return output.getvalue().splitlines()
+
+    def blogdown(self, *args):
+        stdout = subprocess.check_output(
+            ['blogdown'] + list(args), cwd=self.folder)
+        return stdout.decode('utf-8').splitlines()
+
+    def build(self, *args):
+        return self.blogdown('build', *args)
+
+    def status(self):
+        process = subprocess.run(
+            ['blogdown', 'status'], cwd=self.folder, stdout=subprocess.PIPE)
+        return process.returncode, process.stdout.decode('utf-8').split()
+
+    def read_lines(self, *parts):
+        with open(self.path(*parts)) as f:
+            return f.read().splitlines()
+
+    def read_outputs(self):
+        build_dir = self.path('_build')
+        outputs = {}
+        for root, dirs, files in os.walk(build_dir):
+            for file in files:
+                filename = os.path.join(root, file)
+                with open(filename, 'rb') as f:
+                    outputs[os.path.relpath(filename, build_dir)] = f.read()
+        return outputs
+
+
+class TestPartialBuilds(ExampleTestCase):
+
+    def test_deleted_source(self):
+        self.build()
+        os.remove(self.path('2022', '02', '05', 'lists.rst'))
+        self.assertEqual(
+            self.build('2022/02/28/links.rst'),
+            ['U 2022/02/28/links.rst'])
+        with open(self.path('_build', 'index.html')) as f:
+            self.assertNotIn('/2022/02/05/lists/', f.read())
+
+    def test_deleted_source_then_full_build(self):
+        self.build()
+        os.remove(self.path('2022', '02', '05', 'lists.rst'))
+        self.build('2022/02/28/links.rst', '--emit-delta', '_delta')
+        self.assertEqual(self.read_lines('_delta', 'deleted.txt'), [
+            '2022/02/05/lists/index.html',
+        ])
+        self.assertFalse(os.path.exists(
+            self.path('_build', '2022', '02', '05', 'lists', 'index.html')))
+        self.assertEqual(self.status(), (0, []))
+
+        self.assertEqual(self.build('--emit-delta', '_delta'), [
+            '0 changed, 0 deleted',
+        ])
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_image_of_stored_context(self):
+        self.add_image()
+        self.edit(
+            '_templates/layout.html', '</main>',
+            '</main>\n{% set image = get_image("/static/photo.png") %}'
+            'SRCSET[{{ image and image.srcset }}]')
+        self.build()
+        self.assertEqual(self.build('about.rst'), ['U about.rst'])
+        with open(self.path('_build', 'about', 'index.html')) as f:
+            self.assertIn(
+                'SRCSET[/static/photo-8w.png 8w, /static/photo.png 32w]',
+                f.read())
+
+    def test_ignored_source(self):
+        self.build()
+        self.assertEqual(self.build('LICENSE.rst'), [])
+        self.assertFalse(os.path.exists(self.path('_build', 'LICENSE')))
+
+
+class TestAssets(ExampleTestCase):
+
+    def setUp(self):
+        ExampleTestCase.setUp(self)
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('fingerprint_static: yes\n')
+        os.makedirs(self.path('static', 'img'))
+        with open(self.path('static', 'img', 'bg.gif'), 'wb') as f:
+            f.write(b'GIF89a')
+        with open(self.path('static', 'style.css'), 'a') as f:
+            f.write('body { background: url(img/bg.gif); }\n'
+                    'main { background: url("./img/bg.gif?v=1#x"); }\n'
+                    'nav { background: url(data:image/gif;base64,R0lG); }\n')
+
+    def read_manifest(self):
+        with open(self.path('_build', 'static', '_assets.json')) as f:
+            return json.load(f)
+
+    def read_output(self, *parts):
+        with open(self.path('_build', *parts)) as f:
+            return f.read()
+
+    def test_manifest(self):
+        self.build()
+        manifest = self.read_manifest()
+        self.assertEqual(sorted(manifest), [
+            '_pygments.css', 'img/bg.gif', 'style.css'])
+        self.assertRegex(
+            manifest['img/bg.gif'], r'^img/bg\.[0-9a-f]{12}\.gif$')
+        for name in list(manifest.values()) + ['_assets.json']:
+            self.assertTrue(
+                os.path.isfile(self.path('_build', 'static', name)))
+        self.assertFalse(
+            os.path.exists(self.path('_build', 'static', 'style.css')))
+        self.assertIn(
+            'href="/static/%s"' % manifest['style.css'],
+            self.read_output('index.html'))
+
+        # the stylesheet is renamed when an image it uses changes
+        with open(self.path('static', 'img', 'bg.gif'), 'ab') as f:
+            f.write(b'changed')
+        self.build()
+        changed = self.read_manifest()
+        self.assertNotEqual(changed['img/bg.gif'], manifest['img/bg.gif'])
+        self.assertNotEqual(changed['style.css'], manifest['style.css'])
+        self.assertEqual(changed['_pygments.css'], manifest['_pygments.css'])
+
+    def test_relative_references(self):
+        self.build()
+        manifest = self.read_manifest()
+        name = posixpath.basename(manifest['img/bg.gif'])
+        css = self.read_output('static', manifest['style.css'])
+        self.assertIn('url(img/%s)' % name, css)
+        self.assertIn('url("./img/%s?v=1#x")' % name, css)
+        self.assertIn('url(data:image/gif;base64,R0lG)', css)
+
+    def test_prefixed_references(self):
+        self.edit(
+            'config.yml', 'canonical_url: https://example.com',
+            'canonical_url: https://example.com/blog')
+        self.edit(
+            '_templates/layout.html', '</main>',
+            '</main>\n<img src="/blog/static/img/bg.gif">'
+            '<img src="https://example.com/blog/static/img/bg.gif">'
+            '<img src="https://example.com/static/img/bg.gif">')
+        self.build()
+        name = self.read_manifest()['img/bg.gif']
+        html = self.read_output('blog', 'about', 'index.html')
+        self.assertIn('"/blog/static/%s"' % name, html)
+        self.assertIn('"https://example.com/blog/static/%s"' % name, html)
+        self.assertIn('"https://example.com/static/%s"' % name, html)
+        self.assertNotIn('img/bg.gif', html)
+
+
+class TestAtomFeeds(ExampleTestCase):
+
+    ns = {'atom': 'http://www.w3.org/2005/Atom'}
+
+    def read_feed(self, *parts):
+        with open(self.path('_build', *parts), 'rb') as f:
+            return f.read()
+
+    def summarize(self, data):
+        def text(element, path):
+            return element.findtext(path, namespaces=self.ns)
+
+        def updated(element):
+            return datetime.fromisoformat(
+                text(element, 'atom:updated').replace('Z', '+00:00'))
+
+        def links(element):
+            return sorted(
+                link.get('href')
+                for link in element.findall('atom:link', self.ns))
+
+        root = ElementTree.fromstring(data)
+        return {
+            'id': text(root, 'atom:id'),
+            'title': text(root, 'atom:title'),
+            'subtitle': text(root, 'atom:subtitle'),
+            'links': links(root),
+            'entries': sorted(
+                (
+                    text(entry, 'atom:id'),
+                    text(entry, 'atom:title'),
+                    text(entry, 'atom:author/atom:name'),
+                    text(entry, 'atom:content').strip(),
+                    links(entry),
+                    updated(entry),
+                )
+                for entry in root.findall('atom:entry', self.ns)
+            ),
+        }
+
+    def test_byte_identical(self):
+        self.build()
+        feeds = [self.read_feed('feed.atom'),
+                 self.read_feed('tags', 'rst', 'feed.atom')]
+        shutil.rmtree(self.path('_build'))
+        shutil.rmtree(self.path('_cache'))
+        self.build()
+        self.assertEqual(feeds, [self.read_feed('feed.atom'),
+                                 self.read_feed('tags', 'rst', 'feed.atom')])
+
+    def test_escaping(self):
+        entry = mock.Mock(
+            source_filename='a.rst', slug='2022/02/02/a', title='A & <B>',
+            pub_date=datetime(2022, 2, 2, tzinfo=timezone.utc))
+        entry.render_contents.return_value = '<p>"x" & y</p>'
+        info = {
+            'id': 'https://example.com/feed.atom?a=1&b=2',
+            'url': 'https://example.com/',
+            'title': 'Feeds & <things>',
+            'subtitle': 'Sub',
+            'author': 'A "quoted" <author>',
+        }
+        f = io.StringIO()
+        atom.write_atom(self.get_builder(), f, info, [entry])
+        summary = self.summarize(f.getvalue().encode('utf-8'))
+        self.assertEqual(summary['id'], info['id'])
+        self.assertEqual(summary['title'], info['title'])
+        self.assertEqual(summary['entries'], [(
+            'https://example.com/2022/02/02/a', 'A & <B>',
+            info['author'], '<p>"x" & y</p>',
+            ['https://example.com/2022/02/02/a'], entry.pub_date,
+        )])
+
+    @unittest.skipIf(feedgen is None, 'feedgen is not installed')
+    def test_matches_feedgen(self):
+        self.build()
+        feeds = [self.read_feed('feed.atom'),
+                 self.read_feed('tags', 'howto', 'feed.atom')]
+        shutil.rmtree(self.path('_build'))
+        shutil.rmtree(self.path('_cache'))
+        self.edit('config.yml', 'feed:\n', 'feed:\n  backend: feedgen\n')
+        self.build()
+        self.assertEqual(
+            [self.summarize(feed) for feed in feeds],
+            [self.summarize(self.read_feed('feed.atom')),
+             self.summarize(self.read_feed('tags', 'howto', 'feed.atom'))])
+
+
+class TestSearch(ExampleTestCase):
+
+    def setUp(self):
+        ExampleTestCase.setUp(self)
+        self.edit('config.yml', 'latex]', 'latex, search]')
+
+    def read_json(self, *parts):
+        with open(self.path('_build', 'search', *parts)) as f:
+            return json.load(f)
+
+    def read_shards(self):
+        folder = self.path('_build', 'search', 'terms')
+        return dict(
+            (name[:-len('.json')], self.read_json('terms', name))
+            for name in os.listdir(folder)
+        )
+
+    def get_doc_id(self, slug):
+        for doc_id, doc in self.read_json('docs.json').items():
+            if doc['url'] == '/' + slug:
+                return int(doc_id)
+
+    def test_shards(self):
+        self.edit('about.rst', 'Exposition', 'Docstring exposition')
+        self.edit(
+            'config.yml', 'modules:\n',
+            'modules:\n  search:\n    prefix_length: 4\n')
+        self.build()
+        docs = self.read_json('docs.json')
+        self.assertEqual(
+            sorted(doc['url'] for doc in docs.values()), [
+                '/2022/02/02/dlc',
+                '/2022/02/05/lists',
+                '/2022/02/21/codeblocks',
+                '/2022/02/28/links',
+                '/about',
+            ])
+        shards = self.read_shards()
+        self.assertIn('docs', shards)
+        for prefix, shard in shards.items():
+            for term, postings in shard.items():
+                self.assertEqual(term[:4], prefix)
+                for doc_id, weight in postings:
+                    self.assertIn(str(doc_id), docs)
+
+    def test_incremental(self):
+        self.build()
+        links = self.get_doc_id('2022/02/28/links')
+        untouched = dict(
+            (prefix, os.stat(self.path(
+                '_build', 'search', 'terms', prefix + '.json')).st_mtime_ns)
+            for prefix, shard in self.read_shards().items()
+            if all(doc_id != links
+                   for postings in shard.values()
+                   for doc_id, weight in postings)
+        )
+        self.assertTrue(untouched)
+
+        self.edit('2022/02/28/links.rst', 'Duis dolor', 'Quux dolor')
+        self.build()
+        self.assertEqual(self.get_doc_id('2022/02/28/links'), links)
+        shards = self.read_shards()
+        self.assertIn(links, [
+            doc_id for doc_id, weight in shards['qu']['quux']])
+        for prefix, mtime in untouched.items():
+            self.assertEqual(os.stat(self.path(
+                '_build', 'search', 'terms', prefix + '.json')).st_mtime_ns,
+                mtime)
+
+    def test_deleted_page(self):
+        self.build()
+        lists = self.get_doc_id('2022/02/05/lists')
+        own = [
+            prefix for prefix, shard in self.read_shards().items()
+            if all(doc_id == lists
+                   for postings in shard.values()
+                   for doc_id, weight in postings)
+        ]
+        self.assertTrue(own)
+
+        os.remove(self.path('2022', '02', '05', 'lists.rst'))
+        self.build()
+        self.assertIsNone(self.get_doc_id('2022/02/05/lists'))
+        shards = self.read_shards()
+        for prefix in own:
+            self.assertNotIn(prefix, shards)
+        for shard in shards.values():
+            for postings in shard.values():
+                self.assertNotIn(lists, [doc_id for doc_id, w in postings])
+
+
+class TestWriterPool(ExampleTestCase):
+
+    def setUp(self):
+        ExampleTestCase.setUp(self)
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('write_workers: 4\nwrite_queue_size: 2\n')
+
+    def test_errors_are_raised(self):
+        pool = WriterPool(lambda filename: None, 2)
+        pool.write(self.path('missing', 'file.txt'), 'contents')
+        self.assertRaises(FileNotFoundError, pool.wait)
+        pool.wait()
+
+        pool.write(self.path('missing', 'file.txt'), 'contents')
+        pool.wait(raise_errors=False)
+        pool.write(self.path('file.txt'), 'contents')
+        pool.wait()
+        with open(self.path('file.txt')) as f:
+            self.assertEqual(f.read(), 'contents')
+
+    def test_error_reaches_run(self):
+        os.makedirs(self.path('_build', 'about', 'index.html'))
+        builder = self.get_builder()
+        self.assertRaises(IsADirectoryError, self.run_builder, builder)
+        self.assertFalse(os.path.exists(self.path('_cache', 'metadata.json')))
+
+    def test_writes_done_before_save(self):
+        builder = self.get_builder()
+        pending = []
+
+        def slow_write(filename, contents, fsync=False):
+            time.sleep(0.005)
+            write_file(filename, contents, fsync)
+
+        def save_metadata(contexts):
+            pending.extend(
+                filename for filename in builder.written_files
+                if not os.path.isfile(filename))
+            save(contexts)
+
+        save = builder.save_metadata
+        with mock.patch('blogdown.writer.write_file', slow_write), \
+                mock.patch.object(builder, 'save_metadata', save_metadata):
+            self.run_builder(builder)
+        self.assertTrue(builder.written_files)
+        self.assertEqual(pending, [])
+
+
+class TestPrecompress(ExampleTestCase):
+
+    def get_siblings(self):
+        return sorted(
+            name for name in self.read_outputs() if name.endswith('.gz'))
+
+    def test_siblings(self):
+        self.build()
+        self.assertEqual(self.get_siblings(), [])
+
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('precompress: [gzip]\n')
+        shutil.rmtree(self.path('_build'))
+        self.build()
+        outputs = self.read_outputs()
+        expected = sorted(
+            name + '.gz' for name in outputs
+            if name.endswith(('.html', '.css', '.atom')))
+        self.assertEqual(self.get_siblings(), expected)
+        self.assertNotIn(os.path.join('2022', '02', '02', 'dlc.sh.gz'),
+                         outputs)
+        for name in expected:
+            self.assertEqual(gzip.decompress(outputs[name]),
+                             outputs[name[:-len('.gz')]])
+
+    def test_server(self):
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('precompress: [gzip]\n')
+        self.build()
+        with open(self.path('_build', 'index.html'), 'rb') as f:
+            contents = f.read()
+        builder = self.get_builder()
+        server = Server('127.0.0.1', 0, builder)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            def get(path, accept_encoding=None):
+                conn = http.client.HTTPConnection(*server.server_address)
+                headers = {}
+                if accept_encoding is not None:
+                    headers['Accept-Encoding'] = accept_encoding
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                rv = (response.getheader('Content-Encoding'),
+                      response.read())
+                conn.close()
+                return rv
+
+            self.assertEqual(get('/'), (None, contents))
+            self.assertEqual(get('/', 'br'), (None, contents))
+            self.assertEqual(get('/', 'gzip;q=0'), (None, contents))
+            encoding, body = get('/', 'br, gzip')
+            self.assertEqual(encoding, 'gzip')
+            self.assertEqual(gzip.decompress(body), contents)
+            self.assertEqual(get('/2022/02/02/dlc.sh', 'gzip')[0], None)
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+
+class TitleLengths(BatchHook):
+    parallel_safe = True
+
+    def __init__(self):
+        self.chunks = []
+
+    def extract(self, context):
+        return context.title
+
+    def map(self, items):
+        self.chunks.append(items)
+        return [len(title) for title in items]
+
+    def merge(self, results):
+        return [length for result in results for length in result]
+
+    def apply(self, builder, entries, result):
+        builder.get_storage('lengths')['all'] = result
+
+
+class TestBatchHooks(ExampleTestCase):
+
+    def test_chunks(self):
+        builder = self.get_builder()
+        entries = [mock.Mock(title=title) for title in ('a', 'bb', 'ccc')]
+        with ThreadPoolExecutor(2) as executor:
+            hook = TitleLengths()
+            run_batch_hook(hook, builder, entries, executor, 2)
+            self.assertCountEqual(hook.chunks, [['a', 'bb'], ['ccc']])
+            self.assertEqual(builder.get_storage('lengths')['all'], [1, 2, 3])
+
+            hook = TitleLengths()
+            hook.parallel_safe = False
+            run_batch_hook(hook, builder, entries, executor, 2)
+            self.assertEqual(hook.chunks, [['a', 'bb', 'ccc']])
+            self.assertEqual(builder.get_storage('lengths')['all'], [1, 2, 3])
+
+    def test_workers(self):
+        self.build()
+        expected = self.read_outputs()
+        shutil.rmtree(self.path('_build'))
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('batch_workers: 2\n')
+        self.build()
+        self.assertEqual(self.read_outputs(), expected)
+
+
+class TestMemoize(ExampleTestCase):
+
+    def test_memoize(self):
+        builder = self.get_builder()
+        calls = []
+
+        def compute(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual(builder.memoize('a', compute, 1), 2)
+        self.assertEqual(builder.memoize('a', compute, 5), 2)
+        self.assertEqual(builder.memoize('b', compute, 5), 10)
+        self.assertEqual(calls, [1, 5])
+
+        builder.invalidate_memos()
+        self.assertEqual(builder.memoize('a', compute, 5), 10)
+        self.assertEqual(calls, [1, 5, 5])
+
+    def test_cache_tag(self):
+        builder = self.get_builder()
+        calls = []
+        tmpl = builder.jinja_env.from_string(
+            '{% cache "nav", name %}{{ count() }}{% endcache %}')
+
+        def render(name):
+            return tmpl.render(
+                builder=builder, name=name,
+                count=lambda: calls.append(name) or len(calls))
+
+        self.assertEqual(render('a'), '1')
+        self.assertEqual(render('a'), '1')
+        self.assertEqual(render('b'), '2')
+        builder.invalidate_memos()
+        self.assertEqual(render('a'), '3')
+
+    def test_warm_rebuild_sees_new_titles(self):
+        self.edit(
+            '_templates/layout.html', '<main>',
+            '<main>\n{% cache "recent" %}<ul>'
+            '{% for entry in get_recent_blog_entries() %}'
+            '<li>{{ entry.title }}</li>{% endfor %}</ul>{% endcache %}')
+        builder = self.get_builder()
+        builder.enable_context_cache()
+        self.run_builder(builder)
+        self.edit('2022/02/28/links.rst', 'Suspendisse', 'Suspendissa')
+        self.run_builder(builder)
+
+        for name in ('index.html', '2022/02/28/links/index.html'):
+            contents = self.read_outputs()[name].decode('utf-8')
+            self.assertIn('<li>Suspendissa potenti</li>', contents)
+            self.assertNotIn('<li>Suspendisse potenti</li>', contents)
+
+
+class TestRSTPublishers(ExampleTestCase):
+
+    def test_reuse(self):
+        settings = {'initial_header_level': 2}
+        with rst_publisher(settings) as publisher:
+            publisher.settings.rstblog_context = 'a'
+            with rst_publisher(settings) as nested:
+                self.assertIsNot(nested, publisher)
+            with rst_publisher({'initial_header_level': 3}) as other:
+                self.assertIsNot(other, publisher)
+        with rst_publisher(settings) as reused:
+            self.assertIn(reused, (publisher, nested))
+            self.assertFalse(hasattr(reused.settings, 'rstblog_context'))
+            self.assertEqual(reused.settings.initial_header_level, 2)
+
+    def test_header_levels(self):
+        with open(self.path('deep.rst'), 'w') as f:
+            f.write('rst_header_level: 3\n\nDeep\n====\n\n'
+                    'One\n---\n\nText.\n\nTwo\n---\n\nText.\n')
+        self.build()
+        outputs = self.read_outputs()
+        deep = outputs['deep/index.html'].decode('utf-8')
+        links = outputs['2022/02/28/links/index.html'].decode('utf-8')
+        self.assertIn('<h3>One</h3>', deep)
+        self.assertNotIn('<h2>', deep)
+        self.assertIn('<h2><a class="toc-backref"', links)
+
+
+class TestOutputStats(ExampleTestCase):
+
+    def test_listing(self):
+        builder = self.get_builder()
+        folder = self.path('_build', 'stats')
+        with mock.patch('os.scandir', wraps=os.scandir) as scandir:
+            self.assertIsNone(
+                builder.get_output_stat(os.path.join(folder, 'a.html')))
+            self.assertIsNone(
+                builder.get_output_stat(os.path.join(folder, 'b.html')))
+            self.assertEqual(scandir.call_count, 1)
+
+            builder.write_output(os.path.join(folder, 'a.html'), 'a')
+            st = builder.get_output_stat(os.path.join(folder, 'a.html'))
+            self.assertEqual(st.st_size, 1)
+            self.assertEqual(scandir.call_count, 2)
+
+            builder.remove_output_file(os.path.join(folder, 'a.html'))
+            self.assertIsNone(
+                builder.get_output_stat(os.path.join(folder, 'a.html')))
+
+    def test_rebuilds(self):
+        self.build()
+        os.remove(self.path('_build', 'about', 'index.html'))
+        os.utime(self.path('2022', '02', '05', 'lists.rst'))
+        self.assertCountEqual(
+            self.build(), ['A about.rst', 'U 2022/02/05/lists.rst'])
+
+    def test_symlinked_folders(self):
+        os.makedirs(self.path('real'))
+        with open(self.path('real', 'x.txt'), 'w') as f:
+            f.write('x')
+        os.symlink('real', self.path('linked'))
+        self.assertIn('A real/x.txt', self.build())
+        self.assertFalse(os.path.exists(self.path('_build', 'linked')))
+
+
+class TestMemoryReport(ExampleTestCase):
+
+    def test_phases(self):
+        output = self.build('--memory-report', 'report.json')
+        self.assertIn('A about.rst', output)
+        self.assertTrue(any(
+            line.startswith('prepare: traced ') for line in output))
+
+        with open(self.path('report.json')) as f:
+            phases = json.load(f)['phases']
+        names = [phase['phase'] for phase in phases]
+        self.assertEqual(names[:3], ['setup', 'prepare', 'build'])
+        self.assertEqual(names[-1], 'save')
+        self.assertIn('finish blogdown.modules.blog.write_blog_files', names)
+        prepare = phases[1]
+        self.assertEqual(prepare['objects']['Context'], 7)
+        self.assertEqual(prepare['objects']['RSTProgram'], 5)
+        self.assertTrue(prepare['top'])
+        for phase in phases:
+            self.assertGreater(phase['traced'], 0)
+            self.assertGreaterEqual(phase['traced_peak'], phase['traced'])
+
+
+class TestDeltas(ExampleTestCase):
+
+    def test_delete_and_change(self):
+        self.build()
+        self.edit('2022/02/28/links.rst', 'Duis dolor', 'Cras dolor')
+        os.remove(self.path('2022', '02', '05', 'lists.rst'))
+        self.build('--emit-delta', '_delta')
+
+        changed = self.read_lines('_delta', 'changed.txt')
+        self.assertIn('2022/02/28/links/index.html', changed)
+        self.assertIn('index.html', changed)
+        self.assertNotIn('static/style.css', changed)
+        self.assertEqual(self.read_lines('_delta', 'deleted.txt'), [
+            '2022/02/05/lists/index.html',
+        ])
+
+        self.build('--emit-delta', '_delta')
+        self.assertEqual(self.read_lines('_delta', 'changed.txt'), [])
+        self.assertEqual(self.read_lines('_delta', 'deleted.txt'), [])
+
+
+class TestShards(ExampleTestCase):
+
+    def build_shards(self):
+        self.build()
+        expected = self.read_outputs()
+        shutil.rmtree(self.path('_build'))
+        shutil.rmtree(self.path('_cache'))
+
+        for shard in ('1/3', '2/3', '3/3'):
+            self.build('--shard', shard)
+        self.blogdown('merge', '--emit-delta', '_delta')
+        return expected
+
+    def test_merge_matches_single_build(self):
+        expected = self.build_shards()
+        self.assertEqual(self.read_outputs(), expected)
+        self.assertEqual(
+            self.read_lines('_delta', 'changed.txt'),
+            sorted(name.replace(os.path.sep, '/') for name in expected))
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_image_derivatives(self):
+        self.add_image()
+        expected = self.build_shards()
+        self.assertIn(os.path.join('static', 'photo-8w.png'), expected)
+        self.assertEqual(self.read_outputs(), expected)
+        self.assertIn(
+            'static/photo-8w.png', self.read_lines('_delta', 'changed.txt'))
+
+    def test_merge_without_shards(self):
+        def merge():
+            return subprocess.run(
+                ['blogdown', 'merge'], cwd=self.folder,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        process = merge()
+        self.assertEqual(process.returncode, 2)
+        self.assertIn(b'there are no shards to merge', process.stderr)
+        self.assertNotIn(b'Traceback', process.stderr)
+
+        self.build('--shard', '1/2')
+        process = merge()
+        self.assertEqual(process.returncode, 2)
+        self.assertIn(b'shards 2 of 2 are missing', process.stderr)
+
+
+class TestDependencies(ExampleTestCase):
+
+    def test_included_file(self):
+        self.build()
+        self.assertEqual(self.status(), (0, []))
+        self.edit('LICENSE.rst', 'license.', 'license.\n\nChanged.')
+        self.assertEqual(self.status(), (1, ['I', 'LICENSE.rst']))
+        self.assertEqual(self.build(), ['U about.rst'])
+        self.assertEqual(self.status(), (0, []))
+
+    def test_template(self):
+        self.build()
+        self.edit('_templates/layout.html', '</main>', '</main>\n<hr>')
+        self.assertEqual(
+            self.status(), (1, ['T', 'layout.html']))
+        self.assertCountEqual(self.build(), [
+            'U about.rst',
+            'U 2022/02/02/dlc.rst',
+            'U 2022/02/05/lists.rst',
+            'U 2022/02/21/codeblocks.rst',
+            'U 2022/02/28/links.rst',
+        ])
+        self.assertEqual(self.status(), (0, []))
+        self.assertEqual(self.build(), [])
+
+
+class TestBuildCache(ExampleTestCase):
+
+    def test_fresh_workspace_hits(self):
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('minify: yes\n')
+        self.assertNotIn('cache', ' '.join(self.build()))
+
+        with TemporaryDirectory() as cache_dir:
+            with open(self.path('config.yml'), 'a') as f:
+                f.write('build_cache: %s\n' % cache_dir)
+            for i in range(2):
+                shutil.rmtree(self.path('_build'))
+                shutil.rmtree(self.path('_cache'))
+                output = self.build()
+            stats = [line for line in output if line.startswith('cache')]
+        self.assertIn('cache page: 5 of 5 hit (100%)', stats)
+        self.assertTrue(all(line.endswith('(100%)') for line in stats))
+
+    def build_fresh(self):
+        shutil.rmtree(self.path('_build'), ignore_errors=True)
+        shutil.rmtree(self.path('_cache'), ignore_errors=True)
+        return [line for line in self.build() if line.startswith('cache')]
+
+    def test_changed_source_misses(self):
+        with TemporaryDirectory() as cache_dir:
+            with open(self.path('config.yml'), 'a') as f:
+                f.write('build_cache: %s\n' % cache_dir)
+            self.build_fresh()
+            self.edit('about.rst', 'Exposition', 'More exposition')
+            self.assertIn('cache page: 4 of 5 hit (80%)', self.build_fresh())
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_changed_image_size(self):
+        self.add_image()
+        self.edit(
+            '_templates/layout.html', '<main>',
+            '<main>\n{% set photo = get_image("/static/photo.png") %}'
+            '<p>{{ photo.width }}x{{ photo.height }}</p>')
+        with TemporaryDirectory() as cache_dir:
+            with open(self.path('config.yml'), 'a') as f:
+                f.write('build_cache: %s\n' % cache_dir)
+            self.build_fresh()
+            Image.new('RGB', (64, 32)).save(self.path('static', 'photo.png'))
+            self.build_fresh()
+        with open(self.path('_build', 'about', 'index.html')) as f:
+            self.assertIn('<p>64x32</p>', f.read())
+
+
+class TestMinify(ExampleTestCase):
+
+    def get_cached(self):
+        return sorted(
+            os.path.basename(dirpath) + name
+            for dirpath, dirnames, filenames in os.walk(
+                self.path('_cache', 'minify'))
+            for name in filenames
+        )
+
+    def test_collect(self):
+        with open(self.path('config.yml'), 'a') as f:
+            f.write('minify: yes\n')
+        self.build()
+        cached = self.get_cached()
+        for text in ('Cras', 'Nunc', 'Nisi'):
+            self.edit('2022/02/28/links.rst', 'Duis dolor', text + ' dolor')
+            self.build()
+            self.edit('2022/02/28/links.rst', text + ' dolor', 'Duis dolor')
+        os.remove(self.path('2022', '02', '05', 'lists.rst'))
+        self.build()
+        self.assertLess(len(self.get_cached()), len(cached))
+
+        with open(self.path('_cache', 'minify.json')) as f:
+            keys = json.load(f)
+        self.assertEqual(self.get_cached(), sorted(set(keys.values())))
+        self.assertNotIn(
+            os.path.join('_build', '2022', '02', '05', 'lists', 'index.html'),
+            keys)
+
+
+class TestRelatedEntries(ExampleTestCase):
+
+    def test_index(self):
+        index = RelatedIndex()
+        items = {
+            'a': (get_features(['x', 'y'], None, 0), 1),
+            'b': (get_features(['x', 'y'], None, 0), 2),
+            'c': (get_features(['x'], None, 0), 3),
+            'd': (get_features(['z'], None, 0), 4),
+        }
+        index.update(items, 5, 0)
+        self.assertEqual(index.get_related('a'), ['b', 'c'])
+        self.assertEqual(index.get_related('c'), ['b', 'a'])
+        self.assertEqual(index.get_related('d'), [])
+
+        del items['b']
+        items['d'] = (get_features(['x', 'z'], None, 0), 4)
+        index.update(items, 5, 0)
+        self.assertEqual(index.get_related('a'), ['d', 'c'])
+        index.update(items, 1, 0)
+        self.assertEqual(index.get_related('a'), ['d'])
+
+    def test_title_words(self):
+        index = RelatedIndex()
+        index.update({
+            'a': (get_features(['x'], 'Lists in Python', 1), 1),
+            'b': (get_features(['x'], 'Codeblocks', 1), 2),
+            'c': (get_features(['x'], 'More Python lists', 1), 3),
+        }, 5, 1)
+        self.assertEqual(index.get_related('a'), ['c', 'b'])
+
+    def test_build(self):
+        builder = self.get_builder()
+        self.run_builder(builder)
+        by_tag = builder.get_storage('tags')['by_tag']
+        related = dict(
+            (context.source_filename,
+             [entry.source_filename for entry in context.related_entries])
+            for context in by_tag['howto'] + by_tag['lorem'])
+        self.assertEqual(related, {
+            os.path.join('2022', '02', '02', 'dlc.rst'):
+                [os.path.join('2022', '02', '05', 'lists.rst')],
+            os.path.join('2022', '02', '05', 'lists.rst'):
+                [os.path.join('2022', '02', '02', 'dlc.rst')],
+            os.path.join('2022', '02', '28', 'links.rst'): [],
+        })
+
+
+class TestDateFormats(ExampleTestCase):
+
+    def test_timezones(self):
+        builder = self.get_builder()
+        value = datetime(2022, 2, 2, 12, tzinfo=timezone.utc)
+        self.assertEqual(builder.format_time(value, 'HH:mm'), '12:00')
+        self.assertEqual(
+            builder.format_time(
+                value.astimezone(timezone(timedelta(hours=1))), 'HH:mm'),
+            '13:00')
+
+
+class TestDaemonBuilds(ExampleTestCase):
+
+    @unittest.skipIf(Image is None, 'Pillow is not installed')
+    def test_warm_rebuild_keeps_images(self):
+        self.add_image()
+        builder = self.get_builder()
+        builder.enable_context_cache()
+        self.run_builder(builder)
+        self.assertEqual(self.run_builder(builder), [])
+
+        storage = builder.get_storage('images')
+        self.assertEqual(
+            storage['by_url']['/static/photo.png'].derivatives,
+            [('/static/photo-8w.png', 8)])
+        cached = [
+            name
+            for dirpath, dirnames, filenames in os.walk(
+                self.path('_cache', 'images'))
+            for name in filenames
+        ]
+        self.assertEqual(len(cached), 1)
+
+    def test_warm_rebuild_keeps_markdown_engine(self):
+        with open(self.path('notes.md'), 'w') as f:
+            f.write('title: Notes\n\nSome *notes*.\n')
+        builder = self.get_builder()
+        builder.enable_context_cache()
+        self.run_builder(builder)
+        engine = builder.markdown_engines[PythonMarkdownBackend]
+
+        self.edit('notes.md', 'Some', 'More')
+        self.run_builder(builder)
+        self.assertIs(
+            builder.markdown_engines[PythonMarkdownBackend], engine)
+        self.assertIn(
+            'More <em>notes</em>',
+            self.read_outputs()['notes/index.html'].decode('utf-8'))
+
+    def test_warm_rebuild_prepares_changed_files(self):
+        builder = self.get_builder()
+        builder.enable_context_cache()
+        self.run_builder(builder)
+        cold = self.read_outputs()
+
+        prepared = []
+
+        def prepare(program):
+            prepared.append(program.context.source_filename)
+            return original(program)
+
+        original = RSTProgram.prepare
+        with mock.patch.object(RSTProgram, 'prepare', prepare):
+            self.assertEqual(self.run_builder(builder), [])
+            self.assertEqual(prepared, [])
+            self.assertEqual(self.read_outputs(), cold)
+
+            self.edit('2022/02/28/links.rst', 'Duis dolor', 'Cras dolor')
+            self.edit('LICENSE.rst', 'license.', 'license.\n\nChanged.')
+            self.run_builder(builder)
+        self.assertCountEqual(prepared, [
+            os.path.join('2022', '02', '28', 'links.rst'),
+            'about.rst',
+        ])
+
+    def test_socket_is_private(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('XDG_RUNTIME_DIR', None)
+            path = daemon.get_socket_path(self.folder)
+            self.assertEqual(path, self.path('_cache', 'daemon.sock'))
+
+            # anything in the way of the socket means building in process
+            os.makedirs(path)
+            self.assertIsNone(daemon.request(self.folder))
+
+
 def ignore_diritem(dir_, name):
     return lambda src, names: [name] if src == dir_ else []
 